@@ -6,6 +6,7 @@
 """
 import sys
 from binance.client import Client
+from sagitta.client import http_session
     
 
 def fetchClient(
@@ -46,4 +47,37 @@ def fetchClient(
     
     print( f"success!" )
 
-    return client
\ No newline at end of file
+    return client
+
+
+def fetchSession(
+        clientType,
+        public=None,
+        base_url=None,
+        **kwargs
+        ):
+    """
+    Get the shared, pooled and retrying REST session for a client type
+
+    Args:
+        clientType:
+            Test or main client
+        public:
+            Optional public key, sent with each request
+        base_url:
+            Override the API URL, e.g. a local stand-in server for tests
+        kwargs:
+            Passed to http_session.RetryingSession on first creation
+    Returns:
+        session:
+            Shared http_session.RetryingSession
+    """
+
+    if base_url is None:
+        if clientType not in http_session.API_URLS:
+            raise ValueError( f"Invalid client type {clientType}" )
+        base_url = http_session.API_URLS[ clientType ]
+
+    print( f" [CLIENT] Using pooled session for {base_url}" )
+
+    return http_session.sharedSession( base_url, api_key=public, **kwargs )
\ No newline at end of file
@@ -4,7 +4,13 @@
 " @author: Michael Kane
 " @date:   07/09/2025
 """
+import time
 from datetime import date
+import requests
+
+
+# Kline interval -> milliseconds
+UNIT_MS = { "s": 1_000, "m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000 }
 
 def fetchKlineData(
         client, 
@@ -36,4 +42,96 @@ def fetchKlineData(
 
     print( f" [CLIENT] Received k-lines" )
 
+    return klines
+
+
+class KlineFetchError(RuntimeError):
+    """
+    Raised when paging fails part way; holds what was received and where
+    to resume from
+    """
+
+    def __init__( self, message, klines, resume_from ):
+        super().__init__( message )
+        self.klines      = klines
+        self.resume_from = resume_from
+
+
+def _toMs(
+        start
+        ):
+    """
+    Convert a start given as epoch ms or a lookback such as "720d" / "12h"
+    into epoch ms
+    """
+
+    if isinstance( start, int ):
+        return start
+
+    return int( time.time() * 1000 ) - int( start[:-1] ) * UNIT_MS[ start[-1] ]
+
+
+def fetchKlineDataResumable(
+        session,
+        pair,
+        period,
+        start,
+        end=None,
+        limit=1000,
+        klines=None
+        ):
+    """
+    Page kline data from /v3/klines through a http_session.RetryingSession,
+    each page starting after the last received open_time.
+
+    Args:
+        session:
+            http_session.RetryingSession, e.g. from fetch_client.fetchSession
+        pair:
+            Pair to be traded
+        period:
+            Timeperiod of each kline
+        start:
+            Epoch ms or lookback such as "720d"
+        end:
+            Optional epoch ms to stop at
+        limit:
+            Klines per request, 1000 is the Binance maximum
+        klines:
+            Klines from an earlier partial run (e.g. KlineFetchError.klines);
+            paging resumes after the last one
+    Returns:
+        klines:
+            Unprocessed kline information, same layout as fetchKlineData
+    """
+
+    klines  = list( klines or [] )
+    next_ms = klines[-1][0] + 1 if klines else _toMs( start )
+
+    print( f" [CLIENT] Paging market k-lines for... {pair} {period} from {next_ms} ({len(klines)} already held)" )
+
+    while True:
+        params = { "symbol": pair, "interval": period, "startTime": next_ms, "limit": limit }
+        if end is not None:
+            params[ "endTime" ] = end
+
+        # Retries exhausted (RuntimeError), a non-retryable HTTP status or
+        # other request failure, or an undecodable body: keep what we have
+        try:
+            page = session.get( "/v3/klines", params=params )
+        except ( RuntimeError, requests.RequestException, ValueError ) as e:
+            raise KlineFetchError( f"Kline paging for {pair} stopped at {next_ms}: {e}", klines, next_ms ) from e
+
+        if not page:
+            break
+
+        klines.extend( page )
+        next_ms = page[-1][0] + 1
+
+        # Short page means we've caught up
+        if len( page ) < limit or ( end is not None and next_ms > end ):
+            break
+
+    print( f" [CLIENT] Received {len(klines)} k-lines" )
+
     return klines
\ No newline at end of file
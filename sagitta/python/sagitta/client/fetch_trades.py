@@ -0,0 +1,154 @@
+"""
+" Fetch aggregated trades for a given crypto pair and stream them
+" compactly into Parquet
+"
+" @author: Michael Kane
+" @date:   27/10/2025
+"""
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+
+# Compact on-disk layout for aggregated trades
+AGG_TRADE_SCHEMA = pa.schema( [
+    ( "agg_id",         pa.int64()   ),
+    ( "price",          pa.float64() ),
+    ( "qty",            pa.float64() ),
+    ( "first_id",       pa.int64()   ),
+    ( "last_id",        pa.int64()   ),
+    ( "time",           pa.int64()   ),
+    ( "is_buyer_maker", pa.bool_()   ),
+] )
+
+
+class TradeFetchError(RuntimeError):
+    """
+    Raised when paging fails part way. Everything received up to
+    'last_id' has been written to the Parquet file, so resume with
+    from_id=last_id+1 into a new path
+    """
+
+    def __init__( self, message, last_id ):
+        super().__init__( message )
+        self.last_id = last_id
+
+
+def _toTable(
+        trades
+        ):
+    """
+    Convert a list of Binance aggTrade dicts into an Arrow table
+    """
+
+    return pa.table( {
+        "agg_id":         [ t[ "a" ] for t in trades ],
+        "price":          [ float( t[ "p" ] ) for t in trades ],
+        "qty":            [ float( t[ "q" ] ) for t in trades ],
+        "first_id":       [ t[ "f" ] for t in trades ],
+        "last_id":        [ t[ "l" ] for t in trades ],
+        "time":           [ t[ "T" ] for t in trades ],
+        "is_buyer_maker": [ t[ "m" ] for t in trades ],
+        }, schema=AGG_TRADE_SCHEMA )
+
+
+def fetchAggTradesToParquet(
+        session,
+        pair,
+        start,
+        end,
+        path,
+        limit=1000,
+        rows_per_group=1_000_000,
+        from_id=None
+        ):
+    """
+    Page /v3/aggTrades from 'start' to 'end' and append them to a Parquet
+    file in row groups, so memory is bounded by 'rows_per_group'.
+
+    If paging fails part way the buffered trades are written and a
+    TradeFetchError carrying the last written id is raised. Parquet files
+    can't be reopened for appending, so a resumed run ('from_id') writes
+    a new part file; trade_bars.buildBars reads the parts in order.
+
+    Args:
+        session:
+            http_session.RetryingSession, e.g. from fetch_client.fetchSession
+        pair:
+            Pair to be traded
+        start:
+            Epoch ms of the first trade wanted
+        end:
+            Epoch ms of the last trade wanted
+        path:
+            Parquet file to write, must not exist when resuming
+        limit:
+            Trades per request, 1000 is the Binance maximum
+        rows_per_group:
+            Trades buffered before each row group is written
+        from_id:
+            Resume from this aggregate trade id instead of 'start'
+    Returns:
+        last_id:
+            Last aggregate trade id written, None if there were none
+    """
+
+    if from_id is not None and os.path.exists( path ):
+        raise FileExistsError( f"(CLIENT) Resuming into existing {path} would overwrite its trades, write to a new part file" )
+
+    print( f" [CLIENT] Fetching aggregated trades for {pair} from {start} to {end} into {path}" )
+
+    buffer  = []
+    last_id = None
+    n_rows  = 0
+
+    with pq.ParquetWriter( path, AGG_TRADE_SCHEMA, compression="zstd" ) as writer:
+        while True:
+            # First page by time (window must be <= 1 hour), then by id
+            by_time = from_id is None
+            if by_time:
+                params = { "symbol": pair, "startTime": start, "endTime": min( end, start + 3_600_000 - 1 ), "limit": limit }
+            else:
+                params = { "symbol": pair, "fromId": from_id, "limit": limit }
+
+            # Retries exhausted, other request failure or undecodable body:
+            # keep what we have on disk and say where to resume
+            try:
+                page = session.get( "/v3/aggTrades", params=params )
+            except ( RuntimeError, requests.RequestException, ValueError ) as e:
+                if buffer:
+                    writer.write_table( _toTable( buffer ) )
+                    n_rows += len( buffer )
+                print( f" [CLIENT] Wrote {n_rows} aggregated trades before failing, last id {last_id}" )
+                raise TradeFetchError( f"Trade paging for {pair} stopped after id {last_id}: {e}", last_id ) from e
+
+            page = [ t for t in page if t[ "T" ] <= end ]
+
+            if not page:
+                # Empty hour with no trades, move the time window on
+                if from_id is None and start + 3_600_000 <= end:
+                    start += 3_600_000
+                    continue
+                break
+
+            buffer.extend( page )
+            last_id = page[-1][ "a" ]
+            from_id = last_id + 1
+
+            if len( buffer ) >= rows_per_group:
+                writer.write_table( _toTable( buffer ) )
+                n_rows += len( buffer )
+                buffer = []
+
+            # Short page by id means we've caught up (or reached 'end')
+            if not by_time and len( page ) < limit:
+                break
+
+        if buffer:
+            writer.write_table( _toTable( buffer ) )
+            n_rows += len( buffer )
+
+    print( f" [CLIENT] Wrote {n_rows} aggregated trades, last id {last_id}" )
+
+    return last_id
@@ -0,0 +1,239 @@
+"""
+" Pooled, retrying HTTP session for the Binance REST API
+"
+" @author: Michael Kane
+" @date:   24/10/2025
+"""
+import random, threading, time
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Base URLs per client type, as configured in fetch_client.fetchClient
+API_URLS = {
+    "test": "https://testnet.binance.vision/api",
+    "main": "https://api.binance.com/api",
+}
+
+# Status codes worth retrying: rate limited, IP banned (temporary) and server errors
+RETRY_STATUS = { 418, 429, 500, 502, 503, 504 }
+
+
+class SessionMetrics:
+    """
+    Thread-safe request counters and latencies
+    """
+
+    def __init__( self, latency_window=10_000 ):
+        self.lock      = threading.Lock()
+        self.requests  = 0
+        self.retries   = 0
+        self.failures  = 0
+        self.status    = {}
+        self.latencies = deque( maxlen=latency_window )
+
+    def record( self, status, latency ):
+        with self.lock:
+            self.requests += 1
+            self.status[ status ] = self.status.get( status, 0 ) + 1
+            self.latencies.append( latency )
+
+    def snapshot( self ):
+        """
+        Current counters and latency percentiles in milliseconds
+        """
+
+        with self.lock:
+            latencies = sorted( self.latencies )
+            snap = {
+                "requests": self.requests,
+                "retries":  self.retries,
+                "failures": self.failures,
+                "status":   dict( self.status ),
+                }
+
+        if latencies:
+            snap[ "latency_ms_mean" ] = 1e3 * sum( latencies ) / len( latencies )
+            snap[ "latency_ms_p50" ]  = 1e3 * latencies[ len(latencies) // 2 ]
+            snap[ "latency_ms_p99" ]  = 1e3 * latencies[ min( len(latencies) - 1, int( 0.99 * len(latencies) ) ) ]
+
+        return snap
+
+
+class RetryingSession:
+    """
+    Keep-alive connection pool with jittered exponential backoff. Honors
+    Retry-After on 418/429 and pauses until the next minute when the
+    X-MBX-USED-WEIGHT-1M header nears 'weight_limit'.
+
+    Args:
+        base_url:
+            API base URL, e.g. API_URLS["main"] or a local stand-in server
+        api_key:
+            Optional key sent as X-MBX-APIKEY
+        pool_size:
+            Connections kept alive per host
+        max_retries:
+            Retries per request after the first attempt
+        backoff_base:
+            First backoff ceiling in seconds, doubled per retry
+        backoff_max:
+            Largest backoff ceiling in seconds
+        weight_limit:
+            Request weight allowed per minute
+        timeout:
+            Per-request timeout in seconds
+    """
+
+    def __init__(
+            self,
+            base_url,
+            api_key=None,
+            pool_size=10,
+            max_retries=5,
+            backoff_base=0.5,
+            backoff_max=30.0,
+            weight_limit=6000,
+            timeout=10.0
+            ):
+
+        self.base_url     = base_url.rstrip( "/" )
+        self.max_retries  = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max  = backoff_max
+        self.weight_limit = weight_limit
+        self.timeout      = timeout
+        self.metrics      = SessionMetrics()
+
+        # Retries handled here, not by urllib3, so they can be counted and jittered
+        adapter = HTTPAdapter( pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0 )
+        self.session = requests.Session()
+        self.session.mount( "http://", adapter )
+        self.session.mount( "https://", adapter )
+        if api_key:
+            self.session.headers[ "X-MBX-APIKEY" ] = api_key
+
+    def _backoff(
+            self,
+            attempt
+            ):
+        """
+        Full-jitter backoff for a retry attempt
+        """
+
+        return random.uniform( 0, min( self.backoff_max, self.backoff_base * 2 ** attempt ) )
+
+    def _rateLimitWait(
+            self,
+            response
+            ):
+        """
+        Seconds to wait before the next request based on response headers
+        """
+
+        # Explicit instruction from the server
+        retry_after = response.headers.get( "Retry-After" )
+        if retry_after is not None and response.status_code in ( 418, 429 ):
+            return float( retry_after )
+
+        # Close to the weight limit, wait for the minute to roll over
+        used = response.headers.get( "X-MBX-USED-WEIGHT-1M" )
+        if used is not None and int( used ) >= 0.9 * self.weight_limit:
+            return 60 - time.time() % 60
+
+        return 0.0
+
+    def get(
+            self,
+            path,
+            params=None
+            ):
+        """
+        GET 'path' relative to the base URL and return decoded JSON,
+        retrying transient failures
+
+        Args:
+            path:
+                Endpoint path, e.g. "/v3/klines"
+            params:
+                Query parameters
+        Returns:
+            data:
+                Decoded JSON body
+        """
+
+        url = self.base_url + path
+
+        for attempt in range( self.max_retries + 1 ):
+            start = time.perf_counter()
+
+            try:
+                response = self.session.get( url, params=params, timeout=self.timeout )
+            except ( requests.ConnectionError, requests.Timeout ) as e:
+                self.metrics.record( "error", time.perf_counter() - start )
+                error, wait = e, self._backoff( attempt )
+            else:
+                self.metrics.record( response.status_code, time.perf_counter() - start )
+                wait = self._rateLimitWait( response )
+
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+
+                    # A truncated or garbled body is transient, retry it
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        error, wait = e, max( wait, self._backoff( attempt ) )
+                    else:
+                        if wait > 0:
+                            print( f" [CLIENT] Near weight limit, pausing {wait:.1f}s" )
+                            time.sleep( wait )
+                        return data
+                else:
+                    error = requests.HTTPError( f"{response.status_code} from {url}", response=response )
+                    wait  = max( wait, self._backoff( attempt ) )
+
+            if attempt == self.max_retries:
+                break
+
+            with self.metrics.lock:
+                self.metrics.retries += 1
+            print( f" [CLIENT] {error}, retry {attempt+1}/{self.max_retries} in {wait:.2f}s" )
+            time.sleep( wait )
+
+        with self.metrics.lock:
+            self.metrics.failures += 1
+
+        raise RuntimeError( f"Request to {url} failed after {self.max_retries} retries" ) from error
+
+    def close(
+            self
+            ):
+        """
+        Close pooled connections
+        """
+
+        self.session.close()
+
+
+# Shared sessions, one pool per ( base_url, api_key )
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def sharedSession(
+        base_url,
+        api_key=None,
+        **kwargs
+        ):
+    """
+    Return the process-wide RetryingSession for 'base_url', creating it on
+    first use, so every pair and shard reuses one connection pool
+    """
+
+    with _SESSIONS_LOCK:
+        key = ( base_url, api_key )
+        if key not in _SESSIONS:
+            _SESSIONS[ key ] = RetryingSession( base_url, api_key=api_key, **kwargs )
+        return _SESSIONS[ key ]
@@ -0,0 +1,260 @@
+"""
+" Classification metrics at every threshold from one sort, with
+" bootstrap confidence intervals computed in worker processes
+"
+" @author: Michael Kane
+" @date:   28/10/2025
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+METRICS = [ "precision", "recall", "f1", "fpr", "mean_return", "total_return" ]
+
+# Resamples per seeded block in bootstrapMetrics
+BOOT_BLOCK = 50
+
+
+def _prepare(
+        scores,
+        labels,
+        returns=None
+        ):
+    """
+    Drop rows with missing values and sort by descending score once.
+    Labels from addBinaryLabel/pct_change are NaN-free only once the last
+    'steps' rows are removed, so those are dropped here.
+    """
+
+    scores = np.asarray( scores, dtype=np.float64 )
+    labels = np.asarray( labels, dtype=np.float64 )
+    rets   = np.zeros_like( scores ) if returns is None else np.asarray( returns, dtype=np.float64 )
+
+    valid = np.isfinite( scores ) & np.isfinite( labels ) & np.isfinite( rets )
+    if not valid.all():
+        print( f" [EVAL] Dropping {int( (~valid).sum() )} rows with missing score, label or return" )
+
+    order = np.argsort( -scores[ valid ], kind="mergesort" )
+
+    return scores[ valid ][ order ], labels[ valid ][ order ], rets[ valid ][ order ]
+
+
+def _cuts(
+        sorted_scores,
+        thresholds
+        ):
+    """
+    Number of rows selected (score >= threshold) for each threshold
+    """
+
+    return np.searchsorted( -sorted_scores, -np.asarray( thresholds, dtype=np.float64 ), side="right" )
+
+
+def _sweep(
+        labels,
+        rets,
+        weights,
+        cuts
+        ):
+    """
+    Confusion counts and metrics at every cut from weighted cumulative
+    sums, O(n + thresholds). Weights are 1 for the plain sweep and the
+    resample counts for a bootstrap.
+    """
+
+    # Cumulative sums with a leading 0 so cut k reads index k
+    cw = np.concatenate( [ [ 0.0 ], np.cumsum( weights ) ] )
+    cy = np.concatenate( [ [ 0.0 ], np.cumsum( weights * labels ) ] )
+    cr = np.concatenate( [ [ 0.0 ], np.cumsum( weights * rets ) ] )
+
+    n_pos, n_all = cy[-1], cw[-1]
+    selected     = cw[ cuts ]
+    tp           = cy[ cuts ]
+    fp           = selected - tp
+
+    with np.errstate( divide="ignore", invalid="ignore" ):
+        precision = tp / selected
+        recall    = tp / n_pos
+        out = {
+            "n_selected":   selected,
+            "tp":           tp,
+            "fp":           fp,
+            "fn":           n_pos - tp,
+            "tn":           ( n_all - n_pos ) - fp,
+            "precision":    precision,
+            "recall":       recall,
+            "f1":           2 * precision * recall / ( precision + recall ),
+            "fpr":          fp / ( n_all - n_pos ),
+            "mean_return":  cr[ cuts ] / selected,
+            "total_return": cr[ cuts ],
+            }
+
+    return out
+
+
+def _curveSummary(
+        sorted_scores,
+        labels,
+        weights
+        ):
+    """
+    ROC AUC and average precision over every distinct score
+    """
+
+    # Last row of each run of equal scores
+    ends = np.append( np.flatnonzero( np.diff( sorted_scores ) != 0 ), len( sorted_scores ) - 1 ) + 1
+    out  = _sweep( labels, np.zeros_like( labels ), weights, ends )
+
+    tpr = np.concatenate( [ [ 0.0 ], out[ "recall" ] ] )
+    fpr = np.concatenate( [ [ 0.0 ], out[ "fpr" ] ] )
+
+    # Trapezoid ROC area, step-wise precision-recall area
+    roc_auc = float( np.sum( np.diff( fpr ) * ( tpr[ 1: ] + tpr[ :-1 ] ) / 2 ) )
+    avg_pre = float( np.nansum( np.diff( tpr ) * out[ "precision" ] ) )
+
+    return { "roc_auc": roc_auc, "average_precision": avg_pre }
+
+
+def thresholdSweep(
+        scores,
+        labels,
+        returns=None,
+        thresholds=None
+        ):
+    """
+    Precision, recall, F1, ROC/PR points and returns of the selected rows
+    at every threshold in one sort-based pass.
+
+    Args:
+        scores:
+            Model scores, higher means more likely label 1
+        labels:
+            Binary labels, e.g. df["binary_label"]
+        returns:
+            Optional forward returns per row, e.g. df["pct_change"], for
+            hit rate (precision) and mean/total return of selected rows
+        thresholds:
+            Thresholds to evaluate, defaults to every distinct score
+    Returns:
+        metrics:
+            DataFrame with one row per threshold (score >= threshold is
+            predicted 1); 'recall' and 'fpr' are the ROC curve, 'recall'
+            and 'precision' the PR curve
+        summary:
+            Dict with roc_auc and average_precision
+    """
+
+    s, y, r = _prepare( scores, labels, returns )
+    weights = np.ones_like( y )
+
+    if thresholds is None:
+        thresholds = np.unique( s )[ ::-1 ]
+
+    metrics = pd.DataFrame( _sweep( y, r, weights, _cuts( s, thresholds ) ) )
+    metrics.insert( 0, "threshold", thresholds )
+
+    summary = _curveSummary( s, y, weights )
+
+    print( f" [EVAL] {len(metrics)} thresholds over {len(s)} rows, ROC AUC {summary['roc_auc']:.4f}, AP {summary['average_precision']:.4f}" )
+
+    return metrics, summary
+
+
+def _bootstrapChunk(
+        args
+        ):
+    """
+    Worker: run one block of 'n' resamples with its own random stream. Resamples are
+    drawn as counts per row of the already sorted rows, so nothing is
+    re-sorted.
+    """
+
+    s, y, r, cuts, n, seed = args
+    rng = np.random.default_rng( seed )
+
+    values = np.empty( ( n, len( METRICS ), len( cuts ) ) )
+    aucs   = np.empty( ( n, 2 ) )
+
+    for i in range( n ):
+        weights = np.bincount( rng.integers( 0, len( s ), len( s ) ), minlength=len( s ) ).astype( np.float64 )
+        out = _sweep( y, r, weights, cuts )
+        values[ i ] = [ out[ m ] for m in METRICS ]
+        summary = _curveSummary( s, y, weights )
+        aucs[ i ] = summary[ "roc_auc" ], summary[ "average_precision" ]
+
+    return values, aucs
+
+
+def bootstrapMetrics(
+        scores,
+        labels,
+        returns=None,
+        thresholds=None,
+        n_boot=1000,
+        ci=0.95,
+        n_workers=None,
+        seed=0
+        ):
+    """
+    Bootstrap confidence intervals for thresholdSweep metrics. Resamples
+    are drawn in blocks of BOOT_BLOCK, each with its own seed, and the
+    blocks are shared out across worker processes, so results depend on
+    'seed' but not on 'n_workers'.
+
+    Args:
+        scores, labels, returns:
+            As thresholdSweep
+        thresholds:
+            Thresholds to evaluate, defaults to 101 score quantiles
+        n_boot:
+            Number of bootstrap resamples
+        ci:
+            Confidence level of the intervals
+        n_workers:
+            Number of worker processes, defaults to the CPU count
+        seed:
+            Seed for reproducible resamples
+    Returns:
+        intervals:
+            DataFrame per threshold with <metric>_lower / <metric>_upper
+        summary:
+            Dict of ( lower, upper ) for roc_auc and average_precision
+    """
+
+    s, y, r = _prepare( scores, labels, returns )
+
+    if thresholds is None:
+        thresholds = np.unique( np.quantile( s, np.linspace( 0, 1, 101 ) ) )[ ::-1 ]
+    cuts = _cuts( s, thresholds )
+
+    sizes     = [ min( BOOT_BLOCK, n_boot - a ) for a in range( 0, n_boot, BOOT_BLOCK ) ]
+    seeds     = np.random.SeedSequence( seed ).spawn( len( sizes ) )
+    n_workers = min( n_workers or os.cpu_count(), len( sizes ) )
+
+    print( f" [EVAL] Bootstrapping {n_boot} resamples in {len(sizes)} blocks over {len(thresholds)} thresholds on {n_workers} workers" )
+
+    with ProcessPoolExecutor( max_workers=n_workers ) as pool:
+        results = list( pool.map( _bootstrapChunk, [ ( s, y, r, cuts, n, sq ) for n, sq in zip( sizes, seeds ) ] ) )
+
+    values = np.concatenate( [ v for v, _ in results ] )
+    aucs   = np.concatenate( [ a for _, a in results ] )
+
+    # Percentile intervals, NaN resamples (e.g. nothing selected) ignored
+    q = [ ( 1 - ci ) / 2, 1 - ( 1 - ci ) / 2 ]
+    with np.errstate( all="ignore" ):
+        lower, upper = np.nanquantile( values, q, axis=0 )
+
+    intervals = pd.DataFrame( { "threshold": thresholds } )
+    for i, m in enumerate( METRICS ):
+        intervals[ f"{m}_lower" ] = lower[ i ]
+        intervals[ f"{m}_upper" ] = upper[ i ]
+
+    auc_lower, auc_upper = np.nanquantile( aucs, q, axis=0 )
+    summary = {
+        "roc_auc":           ( float( auc_lower[0] ), float( auc_upper[0] ) ),
+        "average_precision": ( float( auc_lower[1] ), float( auc_upper[1] ) ),
+        }
+
+    return intervals, summary
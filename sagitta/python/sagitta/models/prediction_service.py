@@ -0,0 +1,197 @@
+"""
+" Local prediction service keeping indicator state and the model in
+" memory, updating features per kline and micro-batching inference
+" across pairs
+"
+" @author: Michael Kane
+" @date:   22/10/2025
+"""
+import threading, time
+from collections import deque
+import numpy as np
+from sagitta.prep import online_indicators
+
+
+def _parseKline(
+        kline
+        ):
+    """
+    Pull the open time and ( open, high, low, close, volume ) floats out
+    of a kline given as a REST kline list, a websocket "k" payload or a
+    dict/row with named columns. The open time is None if not present.
+    """
+
+    # REST: [ open_time, open, high, low, close, volume, ... ]
+    if isinstance( kline, ( list, tuple ) ):
+        return kline[0], tuple( float( x ) for x in kline[ 1:6 ] )
+
+    # Websocket kline payload
+    if "c" in kline:
+        return kline.get( "t" ), tuple( float( kline[ k ] ) for k in ( "o", "h", "l", "c", "v" ) )
+
+    return kline.get( "open_time" ), tuple( float( kline[ k ] ) for k in ( "open", "high", "low", "close", "volume" ) )
+
+
+class PredictionService:
+    """
+    Serve predictions on fresh klines without rebuilding DataFrames.
+
+    Args:
+        model:
+            Fitted model, either with predict_proba (probability of class 1
+            is returned) or a callable taking a 2D float32 array
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs, as used by
+            online_indicators.OnlineFeatures
+        feature_columns:
+            Feature columns the model expects, in order. Defaults to every
+            indicator column
+        latency_window:
+            Number of recent latencies kept per pair for metrics
+    """
+
+    def __init__(
+            self,
+            model,
+            indicators,
+            feature_columns=None,
+            latency_window=10_000
+            ):
+
+        self.model          = model
+        self.indicators     = indicators
+        self.pairs          = {}
+        self.pending        = []
+        self.latencies      = {}
+        self.latency_window = latency_window
+        self.lock           = threading.Lock()
+
+        # Resolve model columns to positions in the online feature row once
+        columns              = online_indicators.OnlineFeatures( indicators ).columns
+        self.feature_columns = feature_columns or columns
+        missing = [ c for c in self.feature_columns if c not in columns ]
+        if missing:
+            raise ValueError( f"(SERVE) PredictionService: features {missing} not produced by indicators" )
+        self.positions = [ columns.index( c ) for c in self.feature_columns ]
+
+    def addPair(
+            self,
+            pair,
+            history=None
+            ):
+        """
+        Start tracking a pair, optionally warming its state from a cleaned
+        kline dataframe
+        """
+
+        features = online_indicators.OnlineFeatures( self.indicators )
+        if history is not None:
+            features.warm( history )
+
+        self.pairs[ pair ]     = features
+        self.latencies[ pair ] = deque( maxlen=self.latency_window )
+
+        print( f" [SERVE] Tracking {pair} ({0 if history is None else len(history)} warm-up klines)" )
+
+    def submit(
+            self,
+            pair,
+            kline
+            ):
+        """
+        Update a pair's features with a closed kline and queue it for the
+        next batched inference
+        """
+
+        start            = time.perf_counter_ns()
+        open_time, ohlcv = _parseKline( kline )
+        row              = self.pairs[ pair ].update( *ohlcv )
+
+        with self.lock:
+            self.pending.append( ( pair, open_time, [ row[i] for i in self.positions ], start ) )
+
+    def flush(
+            self
+            ):
+        """
+        Run one batched inference over every queued request. A pair which
+        submitted several klines since the last flush gets one prediction
+        per kline.
+
+        Returns:
+            predictions:
+                List of ( pair, open_time, prediction ) in submission order
+        """
+
+        with self.lock:
+            pending, self.pending = self.pending, []
+
+        if not pending:
+            return []
+
+        X = np.array( [ row for _, _, row, _ in pending ], dtype=np.float32 )
+
+        if hasattr( self.model, "predict_proba" ):
+            scores = self.model.predict_proba( X )[ :, 1 ]
+        else:
+            scores = np.asarray( self.model( X ) ).reshape( len( pending ) )
+
+        # Latency is measured from kline arrival to prediction
+        end = time.perf_counter_ns()
+        for pair, _, _, start in pending:
+            self.latencies[ pair ].append( ( end - start ) / 1e3 )
+
+        return [ ( pair, open_time, float( score ) ) for ( pair, open_time, _, _ ), score in zip( pending, scores ) ]
+
+    def predict(
+            self,
+            klines
+            ):
+        """
+        Submit one kline per pair and return their predictions from a
+        single batch
+
+        Args:
+            klines:
+                Dict of pair -> kline
+        Returns:
+            predictions:
+                Dict of pair -> prediction
+        """
+
+        # Klines queued by submit would share this batch and be lost from
+        # a dict keyed by pair, so they must be flushed first
+        with self.lock:
+            if self.pending:
+                raise RuntimeError( f"(SERVE) predict: {len(self.pending)} submitted klines not flushed, call flush first" )
+
+        for pair, kline in klines.items():
+            self.submit( pair, kline )
+
+        return { pair: score for pair, _, score in self.flush() }
+
+    def latencyStats(
+            self
+            ):
+        """
+        Per-pair latency metrics in microseconds over the recent window
+
+        Returns:
+            stats:
+                Dict of pair -> { count, mean_us, p50_us, p99_us, max_us }
+        """
+
+        stats = {}
+        for pair, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            values = np.fromiter( latencies, dtype=float )
+            stats[ pair ] = {
+                "count":   len( values ),
+                "mean_us": float( values.mean() ),
+                "p50_us":  float( np.percentile( values, 50 ) ),
+                "p99_us":  float( np.percentile( values, 99 ) ),
+                "max_us":  float( values.max() ),
+                }
+
+        return stats
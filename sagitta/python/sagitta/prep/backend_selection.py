@@ -0,0 +1,294 @@
+"""
+" Pick the fastest indicator backend (pandas or TA-Lib) per indicator
+" and data size, and check the backends agree numerically
+"
+" @author: Michael Kane
+" @date:   29/10/2025
+"""
+import json, time
+import numpy as np
+import pandas as pd
+from sagitta.prep import manual_indicators, talib_backend
+from sagitta.utils import io
+
+
+SIZES = ( 10_000, 100_000, 1_000_000 )
+
+# Rows of the data being processed compared by failedParity
+PARITY_ROWS = 20_000
+
+
+def indicatorKey(
+        name,
+        kwargs
+        ):
+    """
+    Hashable ( function_name, kwargs JSON ) for one indicator call
+    """
+
+    return name, json.dumps( kwargs, sort_keys=True )
+
+
+def selectionKey(
+        name,
+        kwargs
+        ):
+    """
+    indicatorKey as a string, for the JSON calibration written by
+    saveSelection
+    """
+
+    return "|".join( indicatorKey( name, kwargs ) )
+
+
+def _warmup(
+        kwargs
+        ):
+    """
+    Rows skipped before comparing backends: ten times the longest period,
+    enough for differently seeded EMAs to agree to ~1e-9
+    """
+
+    periods = [ v for v in kwargs.values() if isinstance( v, int ) ]
+
+    return 10 * max( periods, default=1 )
+
+
+def _run(
+        func,
+        df,
+        kwargs
+        ):
+    """
+    Columns a backend's indicator adds to a copy of df
+    """
+
+    out = func( df.copy(), **kwargs )
+
+    return out[ [ c for c in out.columns if c not in df.columns ] ]
+
+
+def parity(
+        df,
+        indicators,
+        warmup=None,
+        rtol=1e-6,
+        atol=1e-9
+        ):
+    """
+    Compare every TA-Lib indicator with manual_indicators on the same
+    data and flag columns which differ after the warm-up rows.
+
+    Args:
+        df:
+            Cleaned kline dataframe
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs, those without
+            a TA-Lib version are skipped
+        warmup:
+            Rows to skip before comparing, defaults to ten times the
+            longest period in each indicator's kwargs
+        rtol, atol:
+            Tolerances as np.isclose
+    Returns:
+        report:
+            DataFrame with one row per column: max abs/rel difference,
+            NaN mismatches after warm-up and whether it passed
+    """
+
+    talib_backend.requireTalib()
+
+    rows = []
+    for name, kwargs in indicators:
+        if name not in talib_backend.TALIB_INDICATORS:
+            continue
+
+        expected = _run( getattr( manual_indicators, name ), df, kwargs )
+        actual   = _run( talib_backend.TALIB_INDICATORS[ name ], df, kwargs )
+        skip     = _warmup( kwargs ) if warmup is None else warmup
+
+        for column in expected.columns:
+            a = actual[ column ].to_numpy( dtype=np.float64 )[ skip: ]
+            e = expected[ column ].to_numpy( dtype=np.float64 )[ skip: ]
+
+            both = np.isfinite( a ) & np.isfinite( e )
+            diff = np.abs( a[ both ] - e[ both ] )
+            with np.errstate( divide="ignore", invalid="ignore" ):
+                rel = diff / np.abs( e[ both ] )
+
+            # Non-finite values must match exactly (NaN with NaN, inf with inf)
+            mismatch = int( ( ~both & ~( ( a == e ) | ( np.isnan( a ) & np.isnan( e ) ) ) ).sum() )
+
+            rows.append( {
+                "indicator":      name,
+                "kwargs":         indicatorKey( name, kwargs )[1],
+                "column":         column,
+                "max_abs_diff":   float( diff.max() ) if len( diff ) else 0.0,
+                "max_rel_diff":   float( np.nanmax( rel[ np.isfinite( rel ) ] ) ) if np.isfinite( rel ).any() else 0.0,
+                "nan_mismatches": mismatch,
+                "ok":             bool( mismatch == 0 and np.allclose( a[ both ], e[ both ], rtol=rtol, atol=atol ) ),
+                } )
+
+    report = pd.DataFrame( rows )
+
+    if len( report ):
+        failed = report[ ~report[ "ok" ] ]
+        print( f" [PARITY] {len(report)} columns compared, {len(failed)} differ" )
+        for _, row in failed.iterrows():
+            print( f" [PARITY] {row['indicator']} {row['kwargs']} {row['column']}: max abs diff {row['max_abs_diff']:.3g}, {row['nan_mismatches']} NaN mismatches" )
+
+    return report
+
+
+def failedParity(
+        df,
+        indicators,
+        rows=PARITY_ROWS
+        ):
+    """
+    TA-Lib indicators which disagree with manual_indicators on the data
+    being processed, checked on its last 'rows' rows plus warm-up. Used
+    by pipeline.runIndicators so a calibration that passed on other data
+    can't silently change results. Empty when TA-Lib is missing.
+
+    Args:
+        df:
+            Cleaned kline dataframe
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs
+        rows:
+            Rows compared after the longest warm-up
+    Returns:
+        failed:
+            Set of indicatorKey for the calls which failed parity
+    """
+
+    if not talib_backend.available() or not indicators:
+        return set()
+
+    tail   = df.iloc[ -( rows + max( _warmup( kwargs ) for _, kwargs in indicators ) ): ]
+    report = parity( tail, indicators )
+    if not len( report ):
+        return set()
+
+    return { ( row[ "indicator" ], row[ "kwargs" ] ) for _, row in report[ ~report[ "ok" ] ].iterrows() }
+
+
+def _time(
+        func,
+        df,
+        kwargs,
+        repeats
+        ):
+    """
+    Best of 'repeats' wall times for one indicator call
+    """
+
+    best = np.inf
+    for _ in range( repeats ):
+        work  = df.copy()
+        start = time.perf_counter()
+        func( work, **kwargs )
+        best  = min( best, time.perf_counter() - start )
+
+    return best
+
+
+def calibrate(
+        df,
+        indicators,
+        sizes=SIZES,
+        repeats=3,
+        require_parity=True
+        ):
+    """
+    Time pandas and TA-Lib for every indicator call on the first n rows
+    of df for each size, and keep the fastest backend per call and size.
+    Calls of one indicator with different kwargs are calibrated apart.
+
+    Args:
+        df:
+            Cleaned kline dataframe, sizes longer than it are skipped
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs
+        sizes:
+            Row counts to time at
+        repeats:
+            Timings per backend, the best is kept
+        require_parity:
+            Only select TA-Lib for calls whose columns all pass parity on
+            df; runIndicators checks again on the data it is given
+    Returns:
+        selection:
+            Dict of selectionKey -> list of [ n_rows, backend, pandas_s,
+            talib_s ], for chooseBackend
+    """
+
+    talib_backend.requireTalib()
+
+    failed = failedParity( df, indicators, rows=len( df ) ) if require_parity else set()
+
+    selection = {}
+    for name, kwargs in indicators:
+        if name not in talib_backend.TALIB_INDICATORS:
+            continue
+
+        key = selectionKey( name, kwargs )
+        selection[ key ] = []
+        for n in [ s for s in sizes if s <= len( df ) ]:
+            part = df.iloc[ :n ]
+            t_pd = _time( getattr( manual_indicators, name ), part, kwargs, repeats )
+            t_ta = _time( talib_backend.TALIB_INDICATORS[ name ], part, kwargs, repeats )
+
+            backend = "talib" if t_ta < t_pd and indicatorKey( name, kwargs ) not in failed else "pandas"
+            selection[ key ].append( [ n, backend, t_pd, t_ta ] )
+
+            print( f" [CALIBRATE] {key} at {n} rows: pandas {t_pd*1e3:.2f}ms, talib {t_ta*1e3:.2f}ms -> {backend}" )
+
+    return selection
+
+
+def chooseBackend(
+        selection,
+        name,
+        kwargs,
+        n_rows
+        ):
+    """
+    Backend for one indicator call at a given data size: the entry
+    calibrated at the largest size not above n_rows (else the smallest
+    size). Pandas when uncalibrated or TA-Lib is missing.
+    """
+
+    entries = sorted( ( selection or {} ).get( selectionKey( name, kwargs ), [] ) )
+    if not entries or not talib_backend.available():
+        return "pandas"
+
+    chosen = entries[ 0 ]
+    for entry in entries:
+        if entry[ 0 ] <= n_rows:
+            chosen = entry
+
+    return chosen[ 1 ]
+
+
+def saveSelection(
+        selection,
+        path
+        ):
+    """
+    Write a calibration result to JSON
+    """
+
+    with open( path, "w" ) as f:
+        json.dump( selection, f, indent=2 )
+
+
+def loadSelection(
+        path
+        ):
+    """
+    Read a calibration result written by saveSelection
+    """
+
+    return io.load_JSON( path )
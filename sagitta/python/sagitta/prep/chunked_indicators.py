@@ -0,0 +1,323 @@
+"""
+" Out-of-core indicator computation over Parquet row groups,
+" carrying warm-up rows and EWM state across chunk boundaries
+"
+" @author: Michael Kane
+" @date:   19/10/2025
+"""
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sagitta.prep import manual_indicators
+
+
+def _seededEWM(
+        series,
+        span,
+        seed
+        ):
+    """
+    EWM (adjust=False) of 'series' continuing from a previous EWM value.
+    Prepending the seed gives exactly the same recurrence as a full run.
+    """
+
+    # First chunk, nothing to continue from
+    if seed is None:
+        return series.ewm( span=span, adjust=False ).mean()
+
+    # Prepend seed, run recurrence and drop the seed again
+    seeded = pd.concat( [ pd.Series( [seed] ), series ], ignore_index=True )
+    ewm = seeded.ewm( span=span, adjust=False ).mean().iloc[1:]
+    ewm.index = series.index
+
+    return ewm
+
+
+def _seededCumsum(
+        series,
+        seed
+        ):
+    """
+    Cumulative sum of 'series' continuing from a previous running total.
+    """
+
+    # First chunk, nothing to continue from
+    if seed is None:
+        return series.cumsum()
+
+    # Prepend running total so additions happen in the same order as a full run
+    seeded = pd.concat( [ pd.Series( [seed] ), series ], ignore_index=True )
+    total = seeded.cumsum().iloc[1:]
+    total.index = series.index
+
+    return total
+
+
+def _seededShift(
+        series,
+        seed
+        ):
+    """
+    shift(1) of 'series' where the first row takes the last value of the
+    previous chunk rather than NaN.
+    """
+
+    shifted = series.shift( 1 )
+
+    if seed is not None and len( shifted ) > 0:
+        shifted.iloc[0] = seed
+
+    return shifted
+
+
+def _padWarmup(
+        values,
+        n_warm
+        ):
+    """
+    Pad chunk-only values with NaN for the warm-up rows so they can be
+    assigned back onto the working frame.
+    """
+
+    return np.concatenate( [ np.full( n_warm, np.nan ), np.asarray( values, dtype=float ) ] )
+
+
+def _chunkEMA(
+        df,
+        n_warm,
+        state,
+        lower_period,
+        upper_period
+        ):
+    """
+    Chunked version of manual_indicators.addEMA
+    """
+
+    close = df[ "close" ].iloc[ n_warm: ]
+
+    for period in ( lower_period, upper_period ):
+        # Continue EWM from previous chunk
+        ema = _seededEWM( close, period, state.get( period ) )
+
+        df[ f"ema_{period}" ] = _padWarmup( _seededShift( ema, state.get( period ) ), n_warm )
+
+        # Carry last (unshifted) value forward
+        if len( ema ) > 0:
+            state[ period ] = ema.iloc[-1]
+
+    return df
+
+
+def _chunkMACD(
+        df,
+        n_warm,
+        state,
+        lower_period,
+        upper_period,
+        signal_period
+        ):
+    """
+    Chunked version of manual_indicators.addMACD
+    """
+
+    close = df[ "close" ].iloc[ n_warm: ]
+
+    # Continue both EMAs and the signal line from previous chunk
+    lower_ema = _seededEWM( close, lower_period, state.get( "lower" ) )
+    upper_ema = _seededEWM( close, upper_period, state.get( "upper" ) )
+    macd      = lower_ema - upper_ema
+    signal    = _seededEWM( macd, signal_period, state.get( "signal" ) )
+
+    df[ "macd" ]        = _padWarmup( _seededShift( macd, state.get( "macd" ) ), n_warm )
+    df[ "macd_signal" ] = _padWarmup( _seededShift( signal, state.get( "signal" ) ), n_warm )
+
+    # Carry last (unshifted) values forward
+    if len( close ) > 0:
+        state[ "lower" ]  = lower_ema.iloc[-1]
+        state[ "upper" ]  = upper_ema.iloc[-1]
+        state[ "macd" ]   = macd.iloc[-1]
+        state[ "signal" ] = signal.iloc[-1]
+
+    return df
+
+
+def _chunkATR(
+        df,
+        n_warm,
+        state,
+        ATR_period
+        ):
+    """
+    Chunked version of manual_indicators.addATR. The previous close comes
+    from the single warm-up row.
+    """
+
+    # True range as in addATR, over warm-up and chunk
+    high_low   = df[ "high" ] - df[ "low" ]
+    high_close = ( df[ "high" ] - df[ "close" ].shift() ).abs()
+    low_close  = ( df[ "low" ] - df[ "close" ].shift() ).abs()
+    true_range = pd.concat( [ high_low, high_close, low_close ], axis=1 ).max( axis=1 ).iloc[ n_warm: ]
+
+    # Continue EWM from previous chunk
+    atr = _seededEWM( true_range, ATR_period, state.get( "atr" ) )
+    df[ "atr" ] = _padWarmup( _seededShift( atr, state.get( "atr" ) ), n_warm )
+
+    if len( atr ) > 0:
+        state[ "atr" ] = atr.iloc[-1]
+
+    return df
+
+
+def _chunkOBV(
+        df,
+        n_warm,
+        state
+        ):
+    """
+    Chunked version of manual_indicators.addOBV
+    """
+
+    # Signed volume, previous close comes from the warm-up row
+    direction = np.sign( df[ "close" ].diff() )
+    signed    = ( direction * df[ "volume" ] ).fillna( 0 ).iloc[ n_warm: ]
+
+    # Continue running total
+    obv = _seededCumsum( signed, state.get( "obv" ) )
+    df[ "obv" ] = _padWarmup( obv, n_warm )
+
+    if len( obv ) > 0:
+        state[ "obv" ] = obv.iloc[-1]
+
+    return df
+
+
+def _chunkVWAP(
+        df,
+        n_warm,
+        state,
+        period
+        ):
+    """
+    Chunked version of manual_indicators.addVWAP. The rolling VWAP only
+    needs warm-up rows, the cumulative VWAP carries its running sums.
+    """
+
+    # Continue cumulative sums from previous chunk
+    price_vol = _seededCumsum( ( df[ "volume" ] * df[ "close" ] ).iloc[ n_warm: ], state.get( "price_vol" ) )
+    volume    = _seededCumsum( df[ "volume" ].iloc[ n_warm: ], state.get( "volume" ) )
+    vwap      = price_vol / volume
+
+    df[ "vwap_cumulative" ] = _padWarmup( _seededShift( vwap, state.get( "vwap" ) ), n_warm )
+
+    if len( vwap ) > 0:
+        state[ "price_vol" ] = price_vol.iloc[-1]
+        state[ "volume" ]    = volume.iloc[-1]
+        state[ "vwap" ]      = vwap.iloc[-1]
+
+    # Rolling part is fully determined by the warm-up rows
+    return manual_indicators.addVWAP( df, period )
+
+
+# Per indicator: ( warm-up rows needed before each chunk, stateful chunk function or None )
+# Indicators without a chunk function are run unchanged over warm-up + chunk rows
+CHUNK_SPECS = {
+    "addEMA":           ( lambda lower_period, upper_period: 1,                                   _chunkEMA  ),
+    "addMACD":          ( lambda lower_period, upper_period, signal_period: 1,                    _chunkMACD ),
+    "addATR":           ( lambda ATR_period: 1,                                                   _chunkATR  ),
+    "addOBV":           ( lambda: 1,                                                              _chunkOBV  ),
+    "addVWAP":          ( lambda period: period,                                                  _chunkVWAP ),
+    "addMomIndicator":  ( lambda lower_period, upper_period: max( lower_period, upper_period ) + 1, None     ),
+    "addBB":            ( lambda period: period,                                                  None       ),
+    "addRSI":           ( lambda RSI_period: RSI_period + 1,                                      None       ),
+    "addStochasticOsc": ( lambda period, smooth_period: period + smooth_period - 1,               None       ),
+    "addCCI":           ( lambda period: period,                                                  None       ),
+    "addRollingStats":  ( lambda period: period,                                                  None       ),
+    "addZScore":        ( lambda period: period,                                                  None       ),
+    "addLaggedReturn":  ( lambda period: period + 1,                                              None       ),
+}
+
+
+def computeIndicatorsChunked(
+        in_path,
+        out_path,
+        indicators,
+        rows_per_chunk=1_000_000
+        ):
+    """
+    Stream a cleaned kline Parquet file through manual_indicators in
+    chunks and write the result incrementally. Each chunk is prefixed
+    with the warm-up rows its indicators need, and EWM/cumulative
+    indicators carry their state across boundaries, so the output
+    matches a full in-memory run (window moments up to float rounding).
+    Memory is bounded by 'rows_per_chunk' plus the largest warm-up.
+
+    Args:
+        in_path:
+            Path to cleaned kline Parquet file
+        out_path:
+            Path to write the indicator Parquet file to
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs, e.g.
+            [ ( "addEMA", { "lower_period": 12, "upper_period": 26 } ) ]
+        rows_per_chunk:
+            Maximum number of rows read per chunk
+    Returns:
+        n_rows:
+            Number of rows written
+    """
+
+    # Check every indicator can be chunked before reading anything
+    for name, kwargs in indicators:
+        if name not in CHUNK_SPECS:
+            raise ValueError( f"(CHUNK) computeIndicatorsChunked: indicator {name} cannot be chunked" )
+
+    # Largest warm-up over all requested indicators
+    warmup = max( [ CHUNK_SPECS[ name ][0]( **kwargs ) for name, kwargs in indicators ], default=0 )
+
+    print( f" [PREP] Computing {len(indicators)} indicators in chunks of {rows_per_chunk} rows (warm-up {warmup})... " )
+
+    parquet = pq.ParquetFile( in_path )
+    states  = [ {} for _ in indicators ]
+    tail    = None
+    writer  = None
+    n_rows  = 0
+
+    try:
+        for batch in parquet.iter_batches( batch_size=rows_per_chunk ):
+
+            # Prefix chunk with carried raw rows
+            chunk  = batch.to_pandas()
+            n_warm = 0 if tail is None else len( tail )
+            work   = chunk if tail is None else pd.concat( [ tail, chunk ], ignore_index=True )
+
+            # Keep raw rows for the next chunk's warm-up before adding features
+            tail = work.iloc[ -warmup: ] if warmup > 0 else None
+            feat = work.copy()
+
+            # Apply indicators in the requested order
+            for ( name, kwargs ), state in zip( indicators, states ):
+                chunk_func = CHUNK_SPECS[ name ][1]
+                if chunk_func is None:
+                    feat = getattr( manual_indicators, name )( feat, **kwargs )
+                else:
+                    feat = chunk_func( feat, n_warm, state, **kwargs )
+
+            # Drop warm-up rows and write
+            out = feat.iloc[ n_warm: ]
+            if writer is None:
+                table  = pa.Table.from_pandas( out, preserve_index=False )
+                writer = pq.ParquetWriter( out_path, table.schema )
+            else:
+                table  = pa.Table.from_pandas( out, schema=writer.schema, preserve_index=False )
+            writer.write_table( table )
+
+            n_rows += len( out )
+
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print( f" [PREP] Wrote {n_rows} rows to {out_path}" )
+
+    return n_rows
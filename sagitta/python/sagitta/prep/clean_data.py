@@ -50,8 +50,8 @@ def makeTimeIndex(
     # Set the open time as the df index
     df.index = df["open_time"]
 
-    # Sort by open time
-    df = df.sort_index()
+    # Sort by open time, stable so dropDupes keeps the last received row
+    df = df.sort_index( kind="stable" )
     
     return df
 
@@ -60,20 +60,25 @@ def dropDupes(
         df
         ):
     """
-    Drop rows which contain duplicates of the time column
+    Drop rows which contain duplicates of the time column, or of
+    'bar_id' for trade bars (trade_bars.buildBars), where several bars
+    can open in the same millisecond
     """
 
     # Length before
     before = len(df)
 
+    # Bars are identified by their sequence number, klines by open time
+    key = df["bar_id"].duplicated(keep="last").to_numpy() if "bar_id" in df.columns else df.index.duplicated(keep="last")
+
     # For any duplicated rows, remove all but last
-    deduped = df[~df.index.duplicated(keep="last")]
+    deduped = df[~key]
 
     # Calculate before and after
     after = len(deduped) 
     dropped = before - after
 
-    print( f" [CLEAN] Dropped {dropped} duplicate rows based on time index." )
+    print( f" [CLEAN] Dropped {dropped} duplicate rows based on {'bar id' if 'bar_id' in df.columns else 'time index'}." )
 
     return deduped
 
@@ -0,0 +1,197 @@
+"""
+" Feature-list driven loading: the requested feature columns decide
+" which Parquet columns are read and which indicators are computed
+"
+" @author: Michael Kane
+" @date:   23/10/2025
+"""
+import re
+from sagitta.prep import manual_indicators
+from sagitta.utils import (
+    dataframe_tools,
+    io
+)
+
+
+# Columns available straight from a cleaned kline file
+RAW_COLUMNS = [ "open_time", "open", "high", "low", "close", "volume", "close_time",
+                "quote_asset_volume", "number_of_trades", "taker_buy_base", "taker_buy_quote" ]
+
+# Periods for indicators whose column names don't carry them
+DEFAULT_PARAMS = {
+    "addMACD":              { "lower_period": 12, "upper_period": 26, "signal_period": 9 },
+    "addRSI":               { "RSI_period": 14 },
+    "addATR":               { "ATR_period": 14 },
+    "addCCI":               { "period": 20 },
+    "addStochasticOsc":     { "smooth_period": 3 },
+    "addVWAP":              { "period": 20 },
+    "addFuturePriceColumn": { "steps": 1 },
+    "addBinaryLabel":       { "threshold": 0.0 },
+}
+
+# ( column regex, manual_indicators function, kwargs from regex groups, source columns )
+FEATURE_RULES = [
+    ( r"ema_(\d+)",                          "addEMA",               lambda p: { "lower_period": int(p), "upper_period": int(p) }, [ "close" ] ),
+    ( r"momentum_(\d+)",                     "addMomIndicator",      lambda p: { "lower_period": int(p), "upper_period": int(p) }, [ "close" ] ),
+    ( r"macd|macd_signal",                   "addMACD",              None,                                                       [ "close" ] ),
+    ( r"bb_(\d+)_(?:mean|std|upper|lower)",  "addBB",                lambda p: { "period": int(p) },                             [ "close" ] ),
+    ( r"rsi",                                "addRSI",               None,                                                       [ "close" ] ),
+    ( r"atr",                                "addATR",               None,                                                       [ "high", "low", "close" ] ),
+    ( r"obv",                                "addOBV",               lambda: {},                                                 [ "close", "volume" ] ),
+    ( r"stoch_[kd]_(\d+)",                   "addStochasticOsc",     lambda p: { "period": int(p) },                             [ "high", "low", "close" ] ),
+    ( r"cci",                                "addCCI",               None,                                                       [ "high", "low", "close" ] ),
+    ( r"vwap_(\d+)",                         "addVWAP",              lambda p: { "period": int(p) },                             [ "close", "volume" ] ),
+    ( r"vwap_cumulative",                    "addVWAP",              None,                                                       [ "close", "volume" ] ),
+    ( r"rolling_(?:mean|std|min|max)_(\d+)", "addRollingStats",      lambda p: { "period": int(p) },                             [ "close" ] ),
+    ( r"zscore_(\d+)",                       "addZScore",            lambda p: { "period": int(p) },                             [ "close" ] ),
+    ( r"return_lag_(\d+)",                   "addLaggedReturn",      lambda p: { "period": int(p) },                             [ "close" ] ),
+    ( r"(close|volume)_(?:median|pct_rank|mad)_(\d+)", "addRobustStats", lambda c, p: { "period": int(p), "column": c, "quantiles": () },                  [ "close", "volume" ] ),
+    ( r"(close|volume)_q([\d.]+)_(\d+)",              "addRobustStats", lambda c, q, p: { "period": int(p), "column": c, "quantiles": ( float(q) / 100, ) }, [ "close", "volume" ] ),
+    ( r"atr_(?:median|pct_rank|mad)_(\d+)",            "addRobustStats", lambda p: { "period": int(p), "column": "atr", "quantiles": () },                 [ "high", "low", "close" ] ),
+    ( r"atr_q([\d.]+)_(\d+)",                         "addRobustStats", lambda q, p: { "period": int(p), "column": "atr", "quantiles": ( float(q) / 100, ) }, [ "high", "low", "close" ] ),
+    ( r"future_price|pct_change",            "addFuturePriceColumn", None,                                                       [ "close" ] ),
+    ( r"binary_label",                       "addBinaryLabel",       None,                                                       [ "close" ] ),
+]
+
+
+def _mergeRobustStats(
+        calls,
+        kwargs
+        ):
+    """
+    Fold an addRobustStats call into an existing one over the same column
+    and period by taking the union of their quantiles, so the window is
+    only sorted once. True if it was merged.
+    """
+
+    for i, ( name, other ) in enumerate( calls ):
+        if name == "addRobustStats" and { **other, "quantiles": () } == { **kwargs, "quantiles": () }:
+            calls[ i ] = ( name, { **other, "quantiles": tuple( sorted( set( other[ "quantiles" ] ) | set( kwargs[ "quantiles" ] ) ) ) } )
+            return True
+
+    return False
+
+
+# Indicators taking a ( lower_period, upper_period ) pair of like columns
+PAIRED = ( "addEMA", "addMomIndicator" )
+
+
+def _mergePeriodPair(
+        calls,
+        name,
+        kwargs
+        ):
+    """
+    Fit a single-period addEMA/addMomIndicator request into the calls:
+    nothing if an existing call already makes that period, else fill the
+    free slot of a call still holding one period, so [ "ema_12", "ema_26" ]
+    is one addEMA( 12, 26 ). True if no new call is needed.
+    """
+
+    period = kwargs[ "lower_period" ]
+    for i, ( other_name, other ) in enumerate( calls ):
+        if other_name != name:
+            continue
+        if period in ( other[ "lower_period" ], other[ "upper_period" ] ):
+            return True
+        if other[ "lower_period" ] == other[ "upper_period" ]:
+            low, high = sorted( ( other[ "lower_period" ], period ) )
+            calls[ i ] = ( name, { "lower_period": low, "upper_period": high } )
+            return True
+
+    return False
+
+
+def planFeatures(
+        features,
+        params=None
+        ):
+    """
+    Work out the minimum source columns and indicator calls needed to
+    produce 'features'.
+
+    Args:
+        features:
+            List of feature column names, e.g. [ "ema_12", "rsi", "atr" ]
+        params:
+            Optional dict of function name -> kwargs for indicators whose
+            column names don't carry their periods, overrides DEFAULT_PARAMS
+    Returns:
+        source_columns:
+            Raw columns to read, in file order
+        calls:
+            Ordered, de-duplicated list of ( function_name, kwargs )
+    """
+
+    params  = { **DEFAULT_PARAMS, **( params or {} ) }
+    sources = set()
+    calls   = []
+
+    for feature in features:
+        # Raw columns need no indicator
+        if feature in RAW_COLUMNS:
+            sources.add( feature )
+            continue
+
+        for pattern, name, kwargs_from, source in FEATURE_RULES:
+            match = re.fullmatch( pattern, feature )
+            if match is None:
+                continue
+
+            kwargs = params[ name ] if kwargs_from is None else kwargs_from( *match.groups() )
+            if name == "addStochasticOsc":
+                kwargs = { **kwargs, "smooth_period": params[ name ][ "smooth_period" ] }
+            if name == "addRobustStats" and kwargs[ "column" ] == "atr":
+                kwargs = { **kwargs, "ATR_period": params[ "addATR" ][ "ATR_period" ] }
+
+            # Labels need the future price first
+            needed = [ ( "addFuturePriceColumn", params[ "addFuturePriceColumn" ] ) ] if name == "addBinaryLabel" else []
+            for call in needed + [ ( name, kwargs ) ]:
+                if call in calls:
+                    continue
+                if call[0] == "addRobustStats" and _mergeRobustStats( calls, call[1] ):
+                    continue
+                if call[0] in PAIRED and _mergePeriodPair( calls, *call ):
+                    continue
+                calls.append( call )
+
+            sources.update( source )
+            break
+        else:
+            raise KeyError( f"(FEATURES) planFeatures: don't know how to build feature '{feature}'" )
+
+    return [ c for c in RAW_COLUMNS if c in sources ], calls
+
+
+def loadFeatures(
+        path,
+        features,
+        params=None
+        ):
+    """
+    Load only the columns needed for 'features' from a cleaned kline
+    Parquet file, run only the indicators that produce them and return
+    the features as views on the computed frame.
+
+    Args:
+        path:
+            Path to cleaned kline Parquet file
+        features:
+            List of feature column names
+        params:
+            See planFeatures
+    Returns:
+        df:
+            DataFrame with exactly 'features' as columns
+    """
+
+    source_columns, calls = planFeatures( features, params )
+
+    print( f" [FEATURES] Reading {len(source_columns)} columns, running {len(calls)} indicators for {len(features)} features" )
+
+    df = io.load_ParquetToDf( path, columns=source_columns )
+
+    for name, kwargs in calls:
+        df = getattr( manual_indicators, name )( df, **kwargs )
+
+    return dataframe_tools.subDataframe( df, features )
@@ -0,0 +1,400 @@
+"""
+" Declarative indicator plan: indicators listed in the market config
+" are compiled into a graph of intermediate series (diffs, shifts,
+" EWMs, rolling moments, ...) where shared intermediates are computed
+" once, then executed onto a kline dataframe
+"
+" Nodes are tuples ( op, *args ), args are other nodes, column names
+" (via col) or scalars, so identical sub-expressions hash equal and are
+" de-duplicated. Outputs are built with the same operations, in the same
+" order, as manual_indicators so results match it exactly.
+"
+" @author: Michael Kane
+" @date:   25/10/2025
+"""
+import numpy as np
+import pandas as pd
+from sagitta.utils import io
+
+
+# --- Node constructors -------------------------------------------------------
+
+def col( name ):                return ( "col", name )
+def shift( x, n=1 ):            return ( "shift", x, n )
+def ewm( x, span ):             return ( "ewm", x, span )
+def rmean( x, period ):         return ( "rolling_mean", x, period )
+def rstd( x, period ):          return ( "rolling_std", x, period )
+def rmin( x, period ):          return ( "rolling_min", x, period )
+def rmax( x, period ):          return ( "rolling_max", x, period )
+def rsum( x, period ):          return ( "rolling_sum", x, period )
+def rmad( x, period ):          return ( "rolling_mad", x, period )
+def add( a, b ):                return ( "add", a, b )
+def sub( a, b ):                return ( "sub", a, b )
+def mul( a, b ):                return ( "mul", a, b )
+def div( a, b ):                return ( "div", a, b )
+
+# pandas diff/pct_change are exactly x - x.shift(n) and x / x.shift(n) - 1,
+# building them from shift lets them share the shifted series
+def diff( x, n=1 ):             return sub( x, shift( x, n ) )
+def pct_change( x, n ):         return sub( div( x, shift( x, n ) ), 1 )
+
+
+CLOSE, HIGH, LOW, VOLUME = col( "close" ), col( "high" ), col( "low" ), col( "volume" )
+
+
+# Relative cost per row of each op, used for the plan report
+OP_COST = {
+    "col": 0, "shift": 1, "ewm": 2, "rolling_mean": 2, "rolling_std": 3, "rolling_min": 3,
+    "rolling_max": 3, "rolling_sum": 2, "add": 1, "sub": 1, "mul": 1, "div": 1, "neg": 1,
+    "abs": 1, "sign": 1, "clip_lower": 1, "clip_upper": 1, "max": 3, "cumsum": 1,
+    "fillna0": 1, "zero_to_nan": 1, "nan_if_equal": 1, "ge_int": 1, "rolling_mad": None,
+    }
+
+
+# --- Indicator definitions, mirroring manual_indicators ----------------------
+
+def planFuturePriceColumn( steps ):
+    future = shift( CLOSE, -steps )
+    return { "future_price": future, "pct_change": div( sub( future, CLOSE ), CLOSE ) }, []
+
+
+def planBinaryLabel( threshold, pct_change ):
+    # 'pct_change' is the node from an earlier addFuturePriceColumn, passed in by compilePlan
+    return { "binary_label": ( "ge_int", pct_change, threshold ) }, []
+
+
+def planEMA( lower_period, upper_period ):
+    return { f"ema_{p}": shift( ewm( CLOSE, p ) ) for p in ( lower_period, upper_period ) }, []
+
+
+def planMomIndicator( lower_period, upper_period ):
+    return { f"momentum_{p}": shift( diff( CLOSE, p ) ) for p in ( lower_period, upper_period ) }, []
+
+
+def planMACD( lower_period, upper_period, signal_period ):
+    macd = sub( ewm( CLOSE, lower_period ), ewm( CLOSE, upper_period ) )
+    return { "macd": shift( macd ), "macd_signal": shift( ewm( macd, signal_period ) ) }, []
+
+
+def planBB( period ):
+    mean, std = shift( rmean( CLOSE, period ) ), shift( rstd( CLOSE, period ) )
+    return {
+        f"bb_{period}_mean":  mean,
+        f"bb_{period}_std":   std,
+        f"bb_{period}_upper": add( mean, mul( 2, std ) ),
+        f"bb_{period}_lower": sub( mean, mul( 2, std ) ),
+        }, []
+
+
+def planRSI( RSI_period ):
+    delta = diff( CLOSE )
+    gain  = ( "clip_lower", delta, 0 )
+    loss  = ( "neg", ( "clip_upper", delta, 0 ) )
+    rs    = div( rmean( gain, RSI_period ), rmean( loss, RSI_period ) )
+    return { "rsi": shift( sub( 100, div( 100, add( 1, rs ) ) ) ) }, []
+
+
+def planATR( ATR_period ):
+    prev_close = shift( CLOSE )
+    true_range = ( "max", sub( HIGH, LOW ), ( "abs", sub( HIGH, prev_close ) ), ( "abs", sub( LOW, prev_close ) ) )
+    return { "atr": shift( ewm( true_range, ATR_period ) ) }, []
+
+
+def planOBV():
+    signed = ( "fillna0", mul( ( "sign", diff( CLOSE ) ), VOLUME ) )
+    return { "obv": ( "cumsum", signed ) }, []
+
+
+def planStochasticOsc( period, smooth_period ):
+    lowest_low, highest_high = rmin( LOW, period ), rmax( HIGH, period )
+    k = mul( 100, shift( div( sub( CLOSE, lowest_low ), sub( highest_high, lowest_low ) ) ) )
+    return { f"stoch_k_{period}": k, f"stoch_d_{period}": rmean( k, smooth_period ) }, []
+
+
+def planCCI( period ):
+    typical_price = div( add( add( HIGH, LOW ), CLOSE ), 3 )
+    mad = ( "nan_if_equal", rmad( typical_price, period ), rmax( typical_price, period ), rmin( typical_price, period ) )
+    cci = div( sub( typical_price, rmean( typical_price, period ) ), mul( 0.015, mad ) )
+    return { "cci": shift( cci ) }, []
+
+
+def planVWAP( period ):
+    price_vol = mul( VOLUME, CLOSE )
+    return {
+        "vwap_cumulative": shift( div( ( "cumsum", price_vol ), ( "cumsum", VOLUME ) ) ),
+        f"vwap_{period}":  shift( div( rsum( price_vol, period ), ( "zero_to_nan", rsum( VOLUME, period ) ) ) ),
+        }, []
+
+
+def planRollingStats( period ):
+    return {
+        f"rolling_mean_{period}": shift( rmean( CLOSE, period ) ),
+        f"rolling_std_{period}":  shift( rstd( CLOSE, period ) ),
+        f"rolling_min_{period}":  shift( rmin( CLOSE, period ) ),
+        f"rolling_max_{period}":  shift( rmax( CLOSE, period ) ),
+        }, []
+
+
+def planZScore( period ):
+    mean = rmean( CLOSE, period )
+    std  = ( "nan_if_equal", rstd( CLOSE, period ), rmax( CLOSE, period ), rmin( CLOSE, period ) )
+    return { f"zscore_{period}": shift( div( sub( CLOSE, mean ), std ) ) }, []
+
+
+def planLaggedReturn( period ):
+    return { f"return_lag_{period}": shift( pct_change( CLOSE, period ) ) }, []
+
+
+# manual_indicators function name -> plan definition
+PLAN_DEFINITIONS = {
+    "addFuturePriceColumn": planFuturePriceColumn,
+    "addBinaryLabel":       planBinaryLabel,
+    "addEMA":               planEMA,
+    "addMomIndicator":      planMomIndicator,
+    "addMACD":              planMACD,
+    "addBB":                planBB,
+    "addRSI":               planRSI,
+    "addATR":               planATR,
+    "addOBV":               planOBV,
+    "addStochasticOsc":     planStochasticOsc,
+    "addCCI":               planCCI,
+    "addVWAP":              planVWAP,
+    "addRollingStats":      planRollingStats,
+    "addZScore":            planZScore,
+    "addLaggedReturn":      planLaggedReturn,
+}
+
+
+# --- Compile / execute -------------------------------------------------------
+
+def _isNode(
+        x
+        ):
+    """
+    Nodes are tuples starting with an op name
+    """
+
+    return isinstance( x, tuple ) and len( x ) > 0 and x[0] in OP_COST
+
+
+def _collect(
+        node,
+        seen,
+        order
+        ):
+    """
+    Post-order walk adding unseen nodes, so inputs come before users
+    """
+
+    if node in seen:
+        return
+    for arg in node[ 1: ]:
+        if _isNode( arg ):
+            _collect( arg, seen, order )
+    seen.add( node )
+    order.append( node )
+
+
+def _opCost(
+        node
+        ):
+    """
+    Per-row cost of a node, rolling MAD scales with its window
+    """
+
+    return node[2] if node[0] == "rolling_mad" else OP_COST[ node[0] ]
+
+
+def compilePlan(
+        indicators
+        ):
+    """
+    Compile indicators into an execution plan with shared intermediates
+    de-duplicated.
+
+    Args:
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs naming
+            manual_indicators functions
+    Returns:
+        plan:
+            Dict with "outputs" (column -> node), "nodes" (unique nodes in
+            execution order), "checks" and "naive_nodes" (node evaluations
+            without sharing, i.e. computing each indicator on its own)
+    """
+
+    outputs, checks, naive = {}, [], []
+
+    for name, kwargs in indicators:
+        if name not in PLAN_DEFINITIONS:
+            raise ValueError( f"(PLAN) compilePlan: no plan definition for {name}" )
+
+        # Labels use whichever future price horizon was planned before them
+        if name == "addBinaryLabel":
+            if "pct_change" not in outputs:
+                raise KeyError( "DataFrame is missing required column: 'pct_change'" )
+            kwargs = { **kwargs, "pct_change": outputs[ "pct_change" ] }
+
+        ind_outputs, ind_checks = PLAN_DEFINITIONS[ name ]( **kwargs )
+
+        # Each indicator on its own, for the naive cost
+        own_seen, own_order = set(), []
+        for node in list( ind_outputs.values() ) + [ c for c, _ in ind_checks ]:
+            _collect( node, own_seen, own_order )
+        naive.extend( own_order )
+
+        outputs.update( ind_outputs )
+        checks.extend( ind_checks )
+
+    # Shared plan over every output and check
+    seen, nodes = set(), []
+    for node in list( outputs.values() ) + [ c for c, _ in checks ]:
+        _collect( node, seen, nodes )
+
+    return { "outputs": outputs, "nodes": nodes, "checks": checks, "naive_nodes": naive }
+
+
+def planCost(
+        plan,
+        n_rows=1
+        ):
+    """
+    Report the cost of a plan against computing each indicator on its own
+
+    Args:
+        plan:
+            Plan from compilePlan
+        n_rows:
+            Rows the plan will run over, scales the cost units
+    Returns:
+        report:
+            Dict of node counts, cost units and per-op node counts
+    """
+
+    ops = {}
+    for node in plan[ "nodes" ]:
+        ops[ node[0] ] = ops.get( node[0], 0 ) + 1
+
+    cost       = n_rows * sum( _opCost( n ) for n in plan[ "nodes" ] )
+    naive_cost = n_rows * sum( _opCost( n ) for n in plan[ "naive_nodes" ] )
+
+    report = {
+        "outputs":     len( plan[ "outputs" ] ),
+        "nodes":       len( plan[ "nodes" ] ),
+        "naive_nodes": len( plan[ "naive_nodes" ] ),
+        "cost":        cost,
+        "naive_cost":  naive_cost,
+        "saving":      1 - cost / naive_cost if naive_cost else 0.0,
+        "ops":         ops,
+        }
+
+    print( f" [PLAN] {report['outputs']} outputs from {report['nodes']} nodes "
+           f"(naive {report['naive_nodes']}), cost {cost:.0f} vs {naive_cost:.0f} ({100*report['saving']:.1f}% saved)" )
+
+    return report
+
+
+def _evaluate(
+        node,
+        df,
+        values
+        ):
+    """
+    Evaluate one node given its already evaluated inputs
+    """
+
+    op   = node[0]
+    args = [ values[ a ] if _isNode( a ) else a for a in node[ 1: ] ]
+
+    if op == "col":           return df[ args[0] ]
+    if op == "shift":         return args[0].shift( args[1] )
+    if op == "ewm":           return args[0].ewm( span=args[1], adjust=False ).mean()
+    if op == "rolling_mean":  return args[0].rolling( window=args[1] ).mean()
+    if op == "rolling_std":   return args[0].rolling( window=args[1] ).std()
+    if op == "rolling_min":   return args[0].rolling( window=args[1] ).min()
+    if op == "rolling_max":   return args[0].rolling( window=args[1] ).max()
+    if op == "rolling_sum":   return args[0].rolling( args[1] ).sum()
+    if op == "rolling_mad":   return args[0].rolling( window=args[1] ).apply( lambda x: np.mean( np.abs( x-np.mean(x) ) ) )
+    if op == "add":           return args[0] + args[1]
+    if op == "sub":           return args[0] - args[1]
+    if op == "mul":           return args[0] * args[1]
+    if op == "div":           return args[0] / args[1]
+    if op == "neg":           return -args[0]
+    if op == "abs":           return args[0].abs()
+    if op == "sign":          return np.sign( args[0] )
+    if op == "clip_lower":    return args[0].clip( lower=args[1] )
+    if op == "clip_upper":    return args[0].clip( upper=args[1] )
+    if op == "max":           return pd.concat( args, axis=1 ).max( axis=1 )
+    if op == "cumsum":        return args[0].cumsum()
+    if op == "fillna0":       return args[0].fillna( 0 )
+    if op == "zero_to_nan":   return args[0].replace( 0, np.nan )
+    if op == "nan_if_equal":  return args[0].where( args[1] != args[2] )
+    if op == "ge_int":        return ( args[0] >= args[1] ).astype( int )
+
+    raise ValueError( f"(PLAN) Unknown op {op}" )
+
+
+def executePlan(
+        df,
+        plan
+        ):
+    """
+    Run a compiled plan, each node computed once, and add its outputs to
+    the dataframe. Intermediates are dropped after their last consumer,
+    so only outputs, checks and still-needed nodes are held at once.
+
+    Args:
+        df:
+            Cleaned kline dataframe
+        plan:
+            Plan from compilePlan
+    Returns:
+        df:
+            Adjusted market dataframe
+    """
+
+    keep = set( plan[ "outputs" ].values() ) | { node for node, _ in plan[ "checks" ] }
+
+    # Number of nodes still to run which read each node
+    consumers = {}
+    for node in plan[ "nodes" ]:
+        for arg in { a for a in node[ 1: ] if _isNode( a ) }:
+            consumers[ arg ] = consumers.get( arg, 0 ) + 1
+
+    values = {}
+    for node in plan[ "nodes" ]:
+        values[ node ] = _evaluate( node, df, values )
+
+        for arg in { a for a in node[ 1: ] if _isNode( a ) }:
+            consumers[ arg ] -= 1
+            if consumers[ arg ] == 0 and arg not in keep:
+                del values[ arg ]
+
+    for node, message in plan[ "checks" ]:
+        if ( values[ node ] == 0 ).any():
+            raise ValueError( message )
+
+    for column, node in plan[ "outputs" ].items():
+        df[ column ] = values[ node ]
+
+    return df
+
+
+def loadIndicatorConfig(
+        path
+        ):
+    """
+    Read the 'indicators' list from a market config YAML, e.g.
+
+        indicators:
+          - name: addRSI
+            params: { RSI_period: 14 }
+
+    Returns:
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs
+    """
+
+    config = io.load_YAML( path )
+
+    return [ ( entry[ "name" ], entry.get( "params" ) or {} ) for entry in config.get( "indicators", [] ) ]
@@ -7,6 +7,7 @@
 """
 import pandas as pd
 import numpy as np
+from sagitta.prep import order_statistics
 
 
 def addFuturePriceColumn(
@@ -96,9 +97,10 @@ def addEMA(
             Adjusted market dataframe
     """
 
-     # Calculate EMA's
+     # Calculate EMA's, once if both periods are the same
     df[ f"ema_{lower_period}" ] = df[ "close" ].ewm( span=lower_period, adjust=False ).mean().shift( 1 )
-    df[ f"ema_{upper_period}" ] = df[ "close" ].ewm( span=upper_period, adjust=False ).mean().shift( 1 )
+    if upper_period != lower_period:
+        df[ f"ema_{upper_period}" ] = df[ "close" ].ewm( span=upper_period, adjust=False ).mean().shift( 1 )
 
     return df
 
@@ -122,9 +124,10 @@ def addMomIndicator(
         df:
             Adjusted market dataframe
     """
-    # Calculate momentum differences for defined period
+    # Calculate momentum differences for defined period, once if both are the same
     df[ f"momentum_{lower_period}" ] = df[ "close" ].diff( periods=lower_period ).shift(1)
-    df[ f"momentum_{upper_period}" ] = df[ "close" ].diff( periods=upper_period ).shift(1)
+    if upper_period != lower_period:
+        df[ f"momentum_{upper_period}" ] = df[ "close" ].diff( periods=upper_period ).shift(1)
 
     return df
 
@@ -195,8 +198,8 @@ def addBB(
     df[ f"bb_{period}_std" ] = rolling.std().shift( 1 )
 
     # 2 sigma deviation from mean = upper and lower bands, narrow bands ~ low volatility
-    df[ f"bb_{period}_upper" ] = df[ f"bb_{period}_mid" ] + 2 * df[ f"bb_{period}_std" ] # Possibly overbought
-    df[ f"bb_{period}_lower" ] = df[ f"bb_{period}_mid" ] - 2 * df[ f"bb_{period}_std" ] # Possibly oversold
+    df[ f"bb_{period}_upper" ] = df[ f"bb_{period}_mean" ] + 2 * df[ f"bb_{period}_std" ] # Possibly overbought
+    df[ f"bb_{period}_lower" ] = df[ f"bb_{period}_mean" ] - 2 * df[ f"bb_{period}_std" ] # Possibly oversold
 
     return df
 
@@ -360,6 +363,9 @@ def addCCI(
     # Calculate Mean Absolute Deviation - how far on average each TP is from the mean of the window
     mad_tp = typical_price.rolling( window=period ).apply( lambda x: np.mean( np.abs( x-np.mean(x) ) ) )
 
+    # Flat windows have no CCI, their MAD is 0 up to rounding so give NaN for max == min
+    mad_tp = mad_tp.where( typical_price.rolling( window=period ).max() != typical_price.rolling( window=period ).min() )
+
     # Formula for CCI, 0.015 is a typical scale factor chosen to limit values -100<val<100
     df[ "cci" ] = ( (typical_price-mean_tp) / (0.015*mad_tp) ).shift( 1 )
 
@@ -453,15 +459,11 @@ def addZScore(
     # Get rolling values
     rolling = df[ "close" ].rolling( window=period )
 
-    # Calculate rolling std for defined period
-    std  = rolling.std()
+    # Calculate rolling std for defined period. Flat windows have no z
+    # score, their std is 0 up to rounding, so give NaN for max == min
+    std  = rolling.std().where( rolling.max() != rolling.min() )
     mean = rolling.mean()
 
-    if std == 0:
-        raise ValueError( f"(INDICATOR) addZScore: Rolling std = 0" )
-    elif mean == 0:
-        raise ValueError( f"(INDICATOR) addZScore: Rolling mean = 0" )
-
     # Formula to calculate Z score for the given period
     df[ f"zscore_{period}" ] = ( (df[ "close" ] - mean) / std ).shift( 1 )
 
@@ -489,4 +491,54 @@ def addLaggedReturn(
     # Computes pct change in closing price compared to 'period' steps earlier.
     df[ f"return_lag_{period}" ] = df[ "close" ].pct_change( periods=period ).shift( 1 )
 
-    return df
\ No newline at end of file
+    return df
+
+
+def addRobustStats(
+        df,
+        period,
+        column="close",
+        quantiles=( 0.25, 0.75 ),
+        ATR_period=14
+        ):
+    """
+    Add robust rolling stats for a given period, from pandas' rolling
+    kernels plus a vectorised or sorted-window MAD
+    (order_statistics.rollingOrderStats).
+     1.) Rolling median          -> Outlier resistant trend
+     2.) Rolling quantiles       -> Support / resistance bands
+     3.) Percentile rank         -> Where the latest value sits in the window
+     4.) Median absolute dev.    -> Outlier resistant volatility
+
+    Args:
+        df:
+            Raw market data dataframe
+        period:
+            Period to calculate rolling stats over
+        column:
+            Column to use, e.g. "close", "volume", or "atr" for the ATR
+            of 'ATR_period' (computed here, as in addATR)
+        quantiles:
+            Quantiles in [0, 1] to add, e.g. ( 0.1, 0.9 )
+        ATR_period:
+            ATR window when column="atr"
+    Returns:
+        df:
+            Adjusted market dataframe
+    """
+
+    # ATR is already shifted by addATR, raw columns are shifted here
+    if column == "atr":
+        source = addATR( df[ [ "high", "low", "close" ] ].copy(), ATR_period )[ "atr" ]
+        lag    = 0
+    else:
+        source = df[ column ]
+        lag    = 1
+
+    names = order_statistics.statNames( column, period, quantiles )
+    stats = order_statistics.rollingOrderStats( source.to_numpy( dtype=np.float64 ), period, quantiles )
+
+    for name, values in zip( names, stats ):
+        df[ name ] = pd.Series( values, index=df.index ).shift( lag )
+
+    return df
@@ -0,0 +1,442 @@
+"""
+" Incremental (one kline at a time) versions of the indicators in
+" manual_indicators, for serving predictions on fresh candles
+"
+" After updating with kline t, each indicator returns the value that
+" manual_indicators places on row t+1 (its features are shift(1)-ed),
+" i.e. the feature row for predicting the next candle. addOBV is not
+" shifted in manual_indicators so its value is the one on row t.
+"
+" @author: Michael Kane
+" @date:   22/10/2025
+"""
+import math
+from collections import deque
+from sagitta.prep.order_statistics import SortedWindow, statNames
+
+
+NAN = float( "nan" )
+
+
+def _div(
+        a,
+        b
+        ):
+    """
+    Float division following numpy/pandas: x/0 -> +-inf, 0/0 -> NaN
+    """
+
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign( math.inf, a )
+
+    return a / b
+
+
+class _EWM:
+    """
+    EWM with adjust=False, same recurrence as pandas
+    """
+
+    def __init__( self, span ):
+        self.alpha = 2 / ( span + 1 )
+        self.value = None
+
+    def update( self, x ):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = ( 1 - self.alpha ) * self.value + self.alpha * x
+        return self.value
+
+
+class _Window:
+    """
+    Fixed length window with a running sum, and a Welford mean / M2 (sum
+    of squared deviations) updated as values enter and leave, so the std
+    keeps its precision at large price levels where sum of squares would
+    cancel. Both are recomputed each time the window wraps so rounding
+    can't drift. NaN/inf are counted rather than summed; any in the window
+    gives NaN, as with pandas rolling.
+    """
+
+    def __init__( self, period ):
+        self.period = period
+        self.values = deque( maxlen=period )
+        self.sum    = 0.0
+        self.n      = 0
+        self.avg    = 0.0
+        self.m2     = 0.0
+        self.n_nan  = 0
+        self.pushes = 0
+
+    def _add( self, x ):
+        self.n   += 1
+        delta     = x - self.avg
+        self.avg += delta / self.n
+        self.m2  += delta * ( x - self.avg )
+
+    def _remove( self, x ):
+        self.n -= 1
+        if self.n == 0:
+            self.avg, self.m2 = 0.0, 0.0
+            return
+        delta     = x - self.avg
+        self.avg -= delta / self.n
+        self.m2  -= delta * ( x - self.avg )
+
+    def push( self, x ):
+        if len( self.values ) == self.period:
+            old = self.values[0]
+            if not math.isfinite( old ):
+                self.n_nan -= 1
+            else:
+                self.sum -= old
+                self._remove( old )
+        self.values.append( x )
+        if not math.isfinite( x ):
+            self.n_nan += 1
+        else:
+            self.sum += x
+            self._add( x )
+
+        # Resync once per wrap, O(1) amortised
+        self.pushes += 1
+        if self.pushes % self.period == 0:
+            finite   = [ v for v in self.values if math.isfinite( v ) ]
+            self.sum = math.fsum( finite )
+            self.n   = len( finite )
+            self.avg = self.sum / self.n if self.n else 0.0
+            self.m2  = math.fsum( ( v - self.avg ) ** 2 for v in finite )
+
+    @property
+    def full( self ):
+        return len( self.values ) == self.period and self.n_nan == 0
+
+    def mean( self ):
+        return self.sum / self.period if self.full else NAN
+
+    def std( self ):
+        if not self.full or self.period < 2:
+            return NAN
+        return math.sqrt( max( self.m2, 0.0 ) / ( self.period - 1 ) )
+
+
+class _Extreme:
+    """
+    Rolling min or max over a fixed window using a monotonic deque
+    """
+
+    def __init__( self, period, is_max ):
+        self.period = period
+        self.is_max = is_max
+        self.queue  = deque()
+        self.count  = 0
+
+    def push( self, x ):
+        # Drop values that can never be the extreme again
+        while self.queue and ( self.queue[-1][1] <= x if self.is_max else self.queue[-1][1] >= x ):
+            self.queue.pop()
+        self.queue.append( ( self.count, x ) )
+        if self.queue[0][0] <= self.count - self.period:
+            self.queue.popleft()
+        self.count += 1
+
+    def value( self ):
+        return self.queue[0][1] if self.count >= self.period else NAN
+
+
+class OnlineEMA:
+    """ Incremental manual_indicators.addEMA """
+
+    def __init__( self, lower_period, upper_period ):
+        self.columns = [ f"ema_{lower_period}", f"ema_{upper_period}" ]
+        self.emas    = [ _EWM( lower_period ), _EWM( upper_period ) ]
+
+    def update( self, o, h, l, c, v ):
+        return [ ema.update( c ) for ema in self.emas ]
+
+
+class OnlineMomIndicator:
+    """ Incremental manual_indicators.addMomIndicator """
+
+    def __init__( self, lower_period, upper_period ):
+        self.columns = [ f"momentum_{lower_period}", f"momentum_{upper_period}" ]
+        self.periods = ( lower_period, upper_period )
+        self.closes  = deque( maxlen=max( self.periods ) + 1 )
+
+    def update( self, o, h, l, c, v ):
+        self.closes.append( c )
+        return [ c - self.closes[ -p-1 ] if len( self.closes ) > p else NAN for p in self.periods ]
+
+
+class OnlineMACD:
+    """ Incremental manual_indicators.addMACD """
+
+    def __init__( self, lower_period, upper_period, signal_period ):
+        self.columns = [ "macd", "macd_signal" ]
+        self.lower   = _EWM( lower_period )
+        self.upper   = _EWM( upper_period )
+        self.signal  = _EWM( signal_period )
+
+    def update( self, o, h, l, c, v ):
+        macd = self.lower.update( c ) - self.upper.update( c )
+        return [ macd, self.signal.update( macd ) ]
+
+
+class OnlineBB:
+    """ Incremental manual_indicators.addBB """
+
+    def __init__( self, period ):
+        self.columns = [ f"bb_{period}_mean", f"bb_{period}_std", f"bb_{period}_upper", f"bb_{period}_lower" ]
+        self.window  = _Window( period )
+
+    def update( self, o, h, l, c, v ):
+        self.window.push( c )
+        mean, std = self.window.mean(), self.window.std()
+        return [ mean, std, mean + 2 * std, mean - 2 * std ]
+
+
+class OnlineRSI:
+    """ Incremental manual_indicators.addRSI """
+
+    def __init__( self, RSI_period ):
+        self.columns = [ "rsi" ]
+        self.gains   = _Window( RSI_period )
+        self.losses  = _Window( RSI_period )
+        self.prev    = None
+
+    def update( self, o, h, l, c, v ):
+        # First candle has no delta, as with diff()
+        if self.prev is not None:
+            delta = c - self.prev
+            self.gains.push( max( delta, 0.0 ) )
+            self.losses.push( max( -delta, 0.0 ) )
+        self.prev = c
+
+        rs = _div( self.gains.mean(), self.losses.mean() )
+        return [ 100 - _div( 100, 1 + rs ) ]
+
+
+class OnlineATR:
+    """ Incremental manual_indicators.addATR """
+
+    def __init__( self, ATR_period ):
+        self.columns = [ "atr" ]
+        self.ewm     = _EWM( ATR_period )
+        self.prev    = None
+
+    def update( self, o, h, l, c, v ):
+        true_range = h - l
+        if self.prev is not None:
+            true_range = max( true_range, abs( h - self.prev ), abs( l - self.prev ) )
+        self.prev = c
+        return [ self.ewm.update( true_range ) ]
+
+
+class OnlineOBV:
+    """ Incremental manual_indicators.addOBV (value on row t, unshifted) """
+
+    def __init__( self ):
+        self.columns = [ "obv" ]
+        self.obv     = 0.0
+        self.prev    = None
+
+    def update( self, o, h, l, c, v ):
+        if self.prev is not None and c != self.prev:
+            self.obv += v if c > self.prev else -v
+        self.prev = c
+        return [ self.obv ]
+
+
+class OnlineStochasticOsc:
+    """ Incremental manual_indicators.addStochasticOsc """
+
+    def __init__( self, period, smooth_period ):
+        self.columns = [ f"stoch_k_{period}", f"stoch_d_{period}" ]
+        self.lows    = _Extreme( period, is_max=False )
+        self.highs   = _Extreme( period, is_max=True )
+        self.k       = _Window( smooth_period )
+
+    def update( self, o, h, l, c, v ):
+        self.lows.push( l )
+        self.highs.push( h )
+        lowest_low, highest_high = self.lows.value(), self.highs.value()
+        k = 100 * _div( c - lowest_low, highest_high - lowest_low )
+        self.k.push( k )
+        return [ k, self.k.mean() ]
+
+
+class OnlineCCI:
+    """ Incremental manual_indicators.addCCI, MAD is O(period) per kline """
+
+    def __init__( self, period ):
+        self.columns = [ "cci" ]
+        self.window  = _Window( period )
+
+    def update( self, o, h, l, c, v ):
+        typical_price = ( h + l + c ) / 3
+        self.window.push( typical_price )
+        if not self.window.full:
+            return [ NAN ]
+        if max( self.window.values ) == min( self.window.values ):
+            return [ NAN ]
+        mean = self.window.mean()
+        mad  = sum( abs( x - mean ) for x in self.window.values ) / self.window.period
+        return [ _div( typical_price - mean, 0.015 * mad ) ]
+
+
+class OnlineVWAP:
+    """ Incremental manual_indicators.addVWAP """
+
+    def __init__( self, period ):
+        self.columns   = [ "vwap_cumulative", f"vwap_{period}" ]
+        self.price_vol = 0.0
+        self.volume    = 0.0
+        self.pv_window = _Window( period )
+        self.v_window  = _Window( period )
+
+    def update( self, o, h, l, c, v ):
+        self.price_vol += v * c
+        self.volume    += v
+        self.pv_window.push( v * c )
+        self.v_window.push( v )
+
+        # Zero rolling volume -> NaN, as in addVWAP
+        denom   = self.v_window.sum if self.v_window.full else NAN
+        rolling = NAN if denom == 0 else self.pv_window.sum / denom if self.pv_window.full else NAN
+        return [ _div( self.price_vol, self.volume ), rolling ]
+
+
+class OnlineRollingStats:
+    """ Incremental manual_indicators.addRollingStats """
+
+    def __init__( self, period ):
+        self.columns = [ f"rolling_mean_{period}", f"rolling_std_{period}", f"rolling_min_{period}", f"rolling_max_{period}" ]
+        self.window  = _Window( period )
+        self.lows    = _Extreme( period, is_max=False )
+        self.highs   = _Extreme( period, is_max=True )
+
+    def update( self, o, h, l, c, v ):
+        self.window.push( c )
+        self.lows.push( c )
+        self.highs.push( c )
+        return [ self.window.mean(), self.window.std(), self.lows.value(), self.highs.value() ]
+
+
+class OnlineZScore:
+    """ Incremental manual_indicators.addZScore, flat windows give NaN """
+
+    def __init__( self, period ):
+        self.columns = [ f"zscore_{period}" ]
+        self.window  = _Window( period )
+        self.lows    = _Extreme( period, is_max=False )
+        self.highs   = _Extreme( period, is_max=True )
+
+    def update( self, o, h, l, c, v ):
+        self.window.push( c )
+        self.lows.push( c )
+        self.highs.push( c )
+        if self.lows.value() == self.highs.value():
+            return [ NAN ]
+        return [ _div( c - self.window.mean(), self.window.std() ) ]
+
+
+class OnlineLaggedReturn:
+    """ Incremental manual_indicators.addLaggedReturn """
+
+    def __init__( self, period ):
+        self.columns = [ f"return_lag_{period}" ]
+        self.period  = period
+        self.closes  = deque( maxlen=period + 1 )
+
+    def update( self, o, h, l, c, v ):
+        self.closes.append( c )
+        if len( self.closes ) <= self.period:
+            return [ NAN ]
+        return [ _div( c, self.closes[0] ) - 1 ]
+
+
+class OnlineRobustStats:
+    """ Incremental manual_indicators.addRobustStats """
+
+    def __init__( self, period, column="close", quantiles=( 0.25, 0.75 ), ATR_period=14 ):
+        self.columns   = statNames( column, period, quantiles )
+        self.column    = column
+        self.quantiles = quantiles
+        self.window    = SortedWindow( period )
+        self.atr       = OnlineATR( ATR_period ) if column == "atr" else None
+
+    def update( self, o, h, l, c, v ):
+        if self.atr is not None:
+            x = self.atr.update( o, h, l, c, v )[0]
+        else:
+            x = { "open": o, "high": h, "low": l, "close": c, "volume": v }[ self.column ]
+        self.window.push( x )
+        return (
+            [ self.window.median() ]
+            + [ self.window.quantile( q ) for q in self.quantiles ]
+            + [ self.window.rank( x ) if x == x else NAN, self.window.mad() ]
+            )
+
+
+# manual_indicators function name -> incremental class
+ONLINE_INDICATORS = {
+    "addEMA":           OnlineEMA,
+    "addMomIndicator":  OnlineMomIndicator,
+    "addMACD":          OnlineMACD,
+    "addBB":            OnlineBB,
+    "addRSI":           OnlineRSI,
+    "addATR":           OnlineATR,
+    "addOBV":           OnlineOBV,
+    "addStochasticOsc": OnlineStochasticOsc,
+    "addCCI":           OnlineCCI,
+    "addVWAP":          OnlineVWAP,
+    "addRollingStats":  OnlineRollingStats,
+    "addZScore":        OnlineZScore,
+    "addLaggedReturn":  OnlineLaggedReturn,
+    "addRobustStats":   OnlineRobustStats,
+}
+
+
+class OnlineFeatures:
+    """
+    Latest feature row for one pair, updated one kline at a time.
+
+    Args:
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs naming
+            manual_indicators functions
+    """
+
+    def __init__( self, indicators ):
+        for name, kwargs in indicators:
+            if name not in ONLINE_INDICATORS:
+                raise ValueError( f"(ONLINE) OnlineFeatures: no incremental version of {name}" )
+
+        self.indicators = [ ONLINE_INDICATORS[ name ]( **kwargs ) for name, kwargs in indicators ]
+        self.columns    = [ c for ind in self.indicators for c in ind.columns ]
+        self.row        = [ NAN ] * len( self.columns )
+
+    def update( self, o, h, l, c, v ):
+        """
+        Update every indicator with one kline and return the feature row
+        """
+
+        row = []
+        for ind in self.indicators:
+            row.extend( ind.update( o, h, l, c, v ) )
+        self.row = row
+
+        return row
+
+    def warm( self, df ):
+        """
+        Run historical klines (a cleaned dataframe) through the state
+        """
+
+        for o, h, l, c, v in zip( df[ "open" ], df[ "high" ], df[ "low" ], df[ "close" ], df[ "volume" ] ):
+            self.update( float(o), float(h), float(l), float(c), float(v) )
+
+        return self.row
@@ -0,0 +1,270 @@
+"""
+" Rolling order statistics (median, quantiles, percentile rank and
+" median absolute deviation). Median, quantiles and rank come from
+" pandas' compiled rolling kernels; MAD, which pandas has no kernel for,
+" is vectorised with numpy for short windows and found from a sorted
+" window for long ones. SortedWindow also serves one value at a time.
+"
+" Results follow pandas rolling( period ) with the default min_periods:
+" NaN until the window is full and while it holds a NaN
+"
+" @author: Michael Kane
+" @date:   28/10/2025
+"""
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+NAN = float( "nan" )
+
+# Longest window whose MAD is taken with numpy, O(period) per row in C;
+# longer windows use the sorted window, O(1) amortised Python steps per row
+VECTOR_MAD_PERIOD = 96
+
+# Working memory for one batch of numpy MAD windows
+MAD_BATCH_BYTES = 20_000_000
+
+
+class SortedWindow:
+    """
+    Last 'period' values kept both in arrival order and sorted. Each push
+    is two binary searches plus a list insert/delete, an O(period) memmove,
+    so any order statistic is read without re-sorting the window.
+    """
+
+    def __init__( self, period ):
+        self.period = period
+        self.values = deque()
+        self.sorted = []
+        self.n_nan  = 0
+
+    def push( self, x ):
+        if len( self.values ) == self.period:
+            old = self.values.popleft()
+            if old != old:
+                self.n_nan -= 1
+            else:
+                del self.sorted[ bisect_left( self.sorted, old ) ]
+        self.values.append( x )
+        if x != x:
+            self.n_nan += 1
+        else:
+            insort( self.sorted, x )
+
+    def ready( self ):
+        return len( self.values ) == self.period and self.n_nan == 0
+
+    def quantile( self, q ):
+        """ Linear interpolation between order statistics, as pandas """
+        if not self.ready():
+            return NAN
+        pos  = q * ( self.period - 1 )
+        low  = math.floor( pos )
+        high = min( low + 1, self.period - 1 )
+        return self.sorted[ low ] + ( self.sorted[ high ] - self.sorted[ low ] ) * ( pos - low )
+
+    def median( self ):
+        return self.quantile( 0.5 )
+
+    def rank( self, x ):
+        """ Percentile rank of x, ties get their average rank (pandas rank( pct=True )) """
+        if not self.ready():
+            return NAN
+        less  = bisect_left( self.sorted, x )
+        equal = bisect_right( self.sorted, x ) - less
+        return ( less + ( equal + 1 ) / 2 ) / self.period
+
+    def mad( self ):
+        """ Median of |x - median| over the window """
+        if not self.ready():
+            return NAN
+        return _mad( self.sorted, self.median(), self.period )
+
+
+def _mad(
+        s,
+        med,
+        n
+        ):
+    """
+    Median absolute deviation of the sorted list 's' around 'med'.
+    Distances below and above the median are each already sorted, so the
+    middle of their merge is a binary search over how many come from
+    below, O(log w), rather than a sort.
+    """
+
+    split = bisect_left( s, med )
+    n_lo  = split
+    k     = n // 2
+
+    # Take i distances from below, k+1-i from above: smallest i whose
+    # next distance from below is no smaller than the last from above
+    first, last = max( 0, k + 1 - ( n - split ) ), min( k + 1, n_lo )
+    while first < last:
+        i = ( first + last ) // 2
+        if med - s[ split - 1 - i ] < s[ split + k - i ] - med:
+            first = i + 1
+        else:
+            last = i
+
+    i, j = first, k + 1 - first
+    lo1  = med - s[ split - i ] if i > 0 else -math.inf
+    hi1  = s[ split + j - 1 ] - med if j > 0 else -math.inf
+    kth  = max( lo1, hi1 )
+
+    if n % 2:
+        return kth
+
+    # Even window: also the (k-1)-th, the second largest of those taken
+    lo2 = med - s[ split - i + 1 ] if i > 1 else -math.inf
+    hi2 = s[ split + j - 2 ] - med if j > 1 else -math.inf
+
+    return ( max( min( lo1, hi1 ), lo2, hi2 ) + kth ) / 2
+
+
+def statNames(
+        column,
+        period,
+        quantiles
+        ):
+    """
+    Output column names for rollingOrderStats, in order
+    """
+
+    return (
+        [ f"{column}_median_{period}" ]
+        + [ f"{column}_q{q*100:g}_{period}" for q in quantiles ]
+        + [ f"{column}_pct_rank_{period}", f"{column}_mad_{period}" ]
+        )
+
+
+def _vectorMad(
+        values,
+        period,
+        median
+        ):
+    """
+    MAD of every full window with numpy: distances to each window's
+    median partitioned in batches of windows
+    """
+
+    out  = np.full( len( values ), np.nan )
+    if len( values ) < period:
+        return out
+
+    windows = sliding_window_view( values, period )
+    centres = median[ period - 1: ]
+    k       = period // 2
+    kth     = [ k - 1, k ] if period % 2 == 0 else k
+    batch   = max( 1, MAD_BATCH_BYTES // ( period * 8 ) )
+
+    for a in range( 0, len( windows ), batch ):
+        part = np.partition( np.abs( windows[ a : a + batch ] - centres[ a : a + batch, None ] ), kth, axis=1 )
+        out[ period - 1 + a : period - 1 + a + batch ] = part[ :, k ] if period % 2 else ( part[ :, k - 1 ] + part[ :, k ] ) / 2
+
+    # A NaN in the window gives a NaN median, whatever the partition did
+    out[ np.isnan( median ) ] = np.nan
+
+    return out
+
+
+def _sortedMad(
+        values,
+        period,
+        median
+        ):
+    """
+    MAD of every full window from a sorted window. The k+1 values nearest
+    the median are a contiguous run of the sorted window; its edges are
+    found by bisecting at the previous row's MAD and then stepping, which
+    is a few steps as the MAD moves little from row to row.
+    """
+
+    s, out = [], [ NAN ] * len( values )
+    xs, meds = values.tolist(), median.tolist()
+    k, even  = period // 2, period % 2 == 0
+    guess    = 0.0
+    n_nan    = 0
+
+    for i, x in enumerate( xs ):
+        # SortedWindow.push
+        if i >= period:
+            old = xs[ i - period ]
+            if old != old:
+                n_nan -= 1
+            else:
+                del s[ bisect_left( s, old ) ]
+        if x != x:
+            n_nan += 1
+        else:
+            insort( s, x )
+
+        if n_nan or i < period - 1:
+            continue
+
+        # Values within the previous MAD of the median, then shrink or
+        # grow the run to exactly the k+1 nearest
+        m    = meds[ i ]
+        a, b = bisect_left( s, m - guess ), bisect_right( s, m + guess )
+        while b - a > k + 1:
+            if m - s[ a ] >= s[ b - 1 ] - m:
+                a += 1
+            else:
+                b -= 1
+        while b - a < k + 1:
+            if b == period or ( a > 0 and m - s[ a - 1 ] <= s[ b ] - m ):
+                a -= 1
+            else:
+                b += 1
+
+        # Largest distance in the run, and for even windows the next one
+        lo, hi = abs( s[ a ] - m ), abs( s[ b - 1 ] - m )
+        guess  = max( lo, hi )
+        if not even:
+            out[ i ] = guess
+        elif lo >= hi:
+            out[ i ] = ( guess + max( abs( s[ a + 1 ] - m ), hi ) ) / 2
+        else:
+            out[ i ] = ( guess + max( lo, abs( s[ b - 2 ] - m ) ) ) / 2
+
+    return out
+
+
+def rollingOrderStats(
+        values,
+        period,
+        quantiles=()
+        ):
+    """
+    Median, quantiles, percentile rank of the latest value and MAD for
+    every window ending at each row.
+
+    Args:
+        values:
+            Float array, e.g. df["close"].to_numpy()
+        period:
+            Window length
+        quantiles:
+            Extra quantiles in [0, 1]
+    Returns:
+        stats:
+            List of arrays, one per statistic in statNames order
+    """
+
+    values  = np.asarray( values, dtype=np.float64 )
+    rolling = pd.Series( values ).rolling( window=period )
+
+    median = rolling.median().to_numpy()
+    stats  = [ median ] + [ rolling.quantile( q ).to_numpy() for q in quantiles ]
+    stats.append( rolling.rank( pct=True ).to_numpy() )
+
+    if period <= VECTOR_MAD_PERIOD:
+        stats.append( _vectorMad( values, period, median ) )
+    else:
+        stats.append( np.asarray( _sortedMad( values, period, median ) ) )
+
+    return stats
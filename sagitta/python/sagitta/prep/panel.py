@@ -0,0 +1,200 @@
+"""
+" Cross-asset panel of many cleaned pairs aligned on open_time, with
+" rolling correlation, beta and covariance features computed for all
+" pairs at once from rolling moments
+"
+" @author: Michael Kane
+" @date:   26/10/2025
+"""
+import pandas as pd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def buildPanel(
+        frames,
+        column="close",
+        fill_limit=None
+        ):
+    """
+    Align one column from many cleaned pair dataframes onto a common
+    open_time index in a single concat.
+
+    Args:
+        frames:
+            Dict of pair -> cleaned kline dataframe (indexed by open_time as
+            from clean_data.makeTimeIndex, or with an open_time column)
+        column:
+            Column to take from each pair
+        fill_limit:
+            Forward fill gaps of at most this many bars, None leaves gaps NaN
+    Returns:
+        panel:
+            DataFrame indexed by open_time with one column per pair
+    """
+
+    print( f" [PANEL] Aligning {column} for {len(frames)} pairs... ", end="" )
+
+    # Use the time index if present, else the open_time column
+    series = {}
+    for pair, df in frames.items():
+        s = df[ column ]
+        if not isinstance( df.index, pd.DatetimeIndex ):
+            s = s.set_axis( pd.Index( df[ "open_time" ], name="open_time" ) )
+        series[ pair ] = s
+
+    # One aligned pass over the union of all times
+    panel = pd.concat( series, axis=1, sort=True )
+    n_gaps = int( panel.isna().sum().sum() )
+
+    if fill_limit is not None:
+        panel = panel.ffill( limit=fill_limit )
+
+    print( f"success! {len(panel)} rows, {n_gaps} gaps, {int( panel.isna().sum().sum() )} left after filling" )
+
+    return panel
+
+
+def panelReturns(
+        panel
+        ):
+    """
+    Log returns for every pair in a price panel
+    """
+
+    return np.log( panel ).diff()
+
+
+def _reference(
+        returns,
+        reference
+        ):
+    """
+    Reference return series: a pair in the panel, a Series, or "market"
+    for the equal-weighted mean return across pairs
+    """
+
+    if isinstance( reference, pd.Series ):
+        return reference.reindex( returns.index )
+    if reference == "market":
+        return returns.mean( axis=1 )
+
+    return returns[ reference ]
+
+
+def rollingCoMovement(
+        returns,
+        reference,
+        window
+        ):
+    """
+    Rolling correlation and beta of every pair against a reference,
+    from rolling first and second moments of the whole panel at once.
+    Only rows where both the pair and the reference have a return are
+    used, and a window with any missing row is NaN. Outputs are shift(1)-ed
+    like manual_indicators so row t only uses returns up to t-1.
+
+    Args:
+        returns:
+            Return panel, e.g. from panelReturns
+        reference:
+            Pair name, "market" or a return Series
+        window:
+            Rolling window length
+    Returns:
+        corr:
+            DataFrame of rolling correlations, one column per pair
+        beta:
+            DataFrame of rolling betas, one column per pair
+    """
+
+    ref   = _reference( returns, reference )
+    valid = returns.notna().mul( ref.notna(), axis=0 )
+
+    # Pair and reference returns masked to common rows
+    X = returns.where( valid )
+    Y = pd.DataFrame( np.broadcast_to( ref.to_numpy()[ :, None ], X.shape ), index=X.index, columns=X.columns ).where( valid )
+
+    # Rolling moments for every column in one call each
+    mean_x  = X.rolling( window ).mean()
+    mean_y  = Y.rolling( window ).mean()
+    mean_xy = ( X * Y ).rolling( window ).mean()
+    mean_xx = ( X * X ).rolling( window ).mean()
+    mean_yy = ( Y * Y ).rolling( window ).mean()
+
+    cov   = mean_xy - mean_x * mean_y
+    var_x = ( mean_xx - mean_x * mean_x ).clip( lower=0 )
+    var_y = ( mean_yy - mean_y * mean_y ).clip( lower=0 )
+
+    corr = ( cov / np.sqrt( var_x * var_y ) ).replace( [ np.inf, -np.inf ], np.nan )
+    beta = ( cov / var_y ).replace( [ np.inf, -np.inf ], np.nan )
+
+    return corr.shift( 1 ), beta.shift( 1 )
+
+
+def rollingCovMatrices(
+        returns,
+        window,
+        step=1,
+        max_bytes=64_000_000
+        ):
+    """
+    Rolling N x N covariance matrices of the whole panel, evaluated every
+    'step' rows. Windows are demeaned and multiplied in batches, so
+    besides the ( rows/step ) x N x N result only about 'max_bytes' of
+    working memory is used. Windows with a missing return give NaN
+    entries for the affected pairs. Matrix k uses the 'window' rows
+    ending at times[k], so use the previous matrix for prediction at
+    times[k].
+
+    Args:
+        returns:
+            Return panel, e.g. from panelReturns
+        window:
+            Rolling window length
+        step:
+            Rows between evaluations
+        max_bytes:
+            Working memory for one batch of demeaned windows
+    Returns:
+        times:
+            Index of the last row in each window
+        cov:
+            Array of shape ( len(times), N, N ), sample covariance (ddof=1)
+    """
+
+    values = returns.to_numpy( dtype=np.float64 )
+    n_pairs = values.shape[1]
+
+    # ( n_windows, N, window ) views, no copy
+    windows = sliding_window_view( values, window, axis=0 )[ ::step ]
+    times   = returns.index[ window-1:: step ]
+    cov     = np.empty( ( len( windows ), n_pairs, n_pairs ) )
+
+    # Windows per batch so the demeaned copy stays within max_bytes
+    batch = max( 1, max_bytes // ( n_pairs * window * 8 ) )
+
+    for a in range( 0, len( windows ), batch ):
+        part    = windows[ a : a + batch ]
+        centred = part - part.mean( axis=2, keepdims=True )
+        np.einsum( "kiw,kjw->kij", centred, centred, out=cov[ a : a + batch ] )
+        cov[ a : a + batch ] /= window - 1
+
+    return times, cov
+
+
+def pairFeatures(
+        corr,
+        beta,
+        pair,
+        reference_name,
+        window
+        ):
+    """
+    Columns for one pair, ready to join onto its kline dataframe
+    """
+
+    return pd.DataFrame( {
+        f"corr_{reference_name}_{window}": corr[ pair ],
+        f"beta_{reference_name}_{window}": beta[ pair ],
+        } )
@@ -0,0 +1,159 @@
+"""
+" Backend selector for running the cleaning rules and indicators
+" with pandas or polars, and indicators with TA-Lib where available
+"
+" @author: Michael Kane
+" @date:   20/10/2025
+"""
+from sagitta.prep import (
+    backend_selection,
+    clean_data,
+    manual_indicators,
+    polars_backend,
+    talib_backend
+)
+
+
+BACKENDS = ( "pandas", "polars", "talib", "auto" )
+
+
+def _checkBackend(
+        backend
+        ):
+    """
+    Validate backend name
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError( f"(PIPELINE) Invalid backend {backend}, expected one of {BACKENDS}" )
+
+
+def runCleaning(
+        data,
+        backend="pandas"
+        ):
+    """
+    Run every clean_data rule on raw klines.
+
+    Args:
+        data:
+            Raw kline data. A pandas DataFrame for the pandas backend; a
+            pandas DataFrame, polars DataFrame or LazyFrame (e.g. from
+            io.scan_ParquetToLazy) for the polars backend
+        backend:
+            "polars" or pandas for anything else ("talib"/"auto" only
+            change indicators)
+    Returns:
+        df:
+            Cleaned pandas DataFrame indexed by open_time, or a polars
+            LazyFrame to be passed on to runIndicators
+    """
+
+    _checkBackend( backend )
+
+    print( f" [PREP] Cleaning with {backend} backend" )
+
+    if backend == "polars":
+        return polars_backend.cleanLazy( polars_backend.toLazy( data ) )
+
+    df = clean_data.normalizeDtypes( data )
+    df = clean_data.makeTimeIndex( df )
+    df = clean_data.dropDupes( df )
+    df = clean_data.checkOHLC( df )
+    df = clean_data.removeNegsAndNaNs( df )
+
+    return df
+
+
+def _indicatorFunction(
+        name,
+        kwargs,
+        backend,
+        selection,
+        n_rows
+        ):
+    """
+    manual_indicators function or its TA-Lib version for the pandas based
+    backends; indicators without a TA-Lib version always use pandas
+    """
+
+    if name in talib_backend.TALIB_INDICATORS:
+        if backend == "talib" or ( backend == "auto" and backend_selection.chooseBackend( selection, name, kwargs, n_rows ) == "talib" ):
+            return talib_backend.TALIB_INDICATORS[ name ]
+
+    return getattr( manual_indicators, name )
+
+
+def runIndicators(
+        data,
+        indicators,
+        backend="pandas",
+        selection=None,
+        check_parity=True
+        ):
+    """
+    Add indicators to cleaned klines.
+
+    Args:
+        data:
+            Cleaned kline data, see runCleaning
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs naming
+            manual_indicators functions, e.g.
+            [ ( "addRSI", { "RSI_period": 14 } ) ]
+        backend:
+            "pandas", "polars", "talib" (TA-Lib where it has a version of
+            the indicator) or "auto" (per indicator from 'selection')
+        selection:
+            Calibration from backend_selection.calibrate, for "auto"
+        check_parity:
+            For "talib"/"auto", compare each TA-Lib indicator with pandas
+            on the end of 'data' first (backend_selection.failedParity)
+            and use pandas for any that differ
+    Returns:
+        df:
+            pandas DataFrame, or collected polars DataFrame
+    """
+
+    _checkBackend( backend )
+
+    print( f" [PREP] Adding {len(indicators)} indicators with {backend} backend" )
+
+    if backend == "talib":
+        talib_backend.requireTalib()
+
+    if backend != "polars":
+        df = data
+
+        failed = set()
+        if check_parity and backend in ( "talib", "auto" ) and talib_backend.available():
+            used   = [ ( name, kwargs ) for name, kwargs in indicators if _indicatorFunction( name, kwargs, backend, selection, len( df ) ) is not getattr( manual_indicators, name ) ]
+            failed = backend_selection.failedParity( df, used )
+
+        for name, kwargs in indicators:
+            if backend_selection.indicatorKey( name, kwargs ) in failed:
+                df = getattr( manual_indicators, name )( df, **kwargs )
+            else:
+                df = _indicatorFunction( name, kwargs, backend, selection, len( df ) )( df, **kwargs )
+        return df
+
+    return polars_backend.indicatorsLazy( polars_backend.toLazy( data ), indicators ).collect()
+
+
+def toPandas(
+        df
+        ):
+    """
+    Convert a polars result to pandas, indexed by open_time as in
+    clean_data.makeTimeIndex
+    """
+
+    pdf = df.to_pandas()
+
+    # Nullable trades as in clean_data.normalizeDtypes
+    if "number_of_trades" in pdf.columns:
+        pdf[ "number_of_trades" ] = pdf[ "number_of_trades" ].astype( "Int64" )
+
+    pdf.index = pdf[ "open_time" ]
+
+    return pdf
@@ -0,0 +1,388 @@
+"""
+" Polars lazy-expression versions of the cleaning rules in clean_data
+" and the indicators in manual_indicators
+"
+" @author: Michael Kane
+" @date:   20/10/2025
+"""
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+# Columns cleaned to floats, matches clean_data.normalizeDtypes
+NUM_COLS = [ "open", "high", "low", "close", "volume", "quote_asset_volume", "taker_buy_base", "taker_buy_quote" ]
+
+
+def requirePolars():
+    """
+    Raise a helpful error if polars is not installed
+    """
+
+    if pl is None:
+        raise ImportError( "(POLARS) polars is required for the polars backend: pip install polars" )
+
+
+def toLazy(
+        data
+        ):
+    """
+    Accept a pandas DataFrame, polars DataFrame or polars LazyFrame and
+    return a polars LazyFrame
+    """
+
+    requirePolars()
+
+    if isinstance( data, pl.LazyFrame ):
+        return data
+    if isinstance( data, pl.DataFrame ):
+        return data.lazy()
+
+    # pandas, drop the index as the pandas path keeps open_time as a column too
+    return pl.from_pandas( data, include_index=False ).lazy()
+
+
+def cleanLazy(
+        lf
+        ):
+    """
+    Apply the clean_data rules as one lazy query:
+    - normalizeDtypes, makeTimeIndex, dropDupes, checkOHLC, removeNegsAndNaNs
+
+    Args:
+        lf:
+            Polars LazyFrame of raw klines
+    Returns:
+        lf:
+            Cleaned LazyFrame sorted by open_time
+    """
+
+    requirePolars()
+
+    # normalizeDtypes - unknown values become null
+    lf = lf.with_columns(
+        [ pl.col( c ).cast( pl.Float64, strict=False ) for c in NUM_COLS ]
+        + [ pl.col( "number_of_trades" ).cast( pl.Float64, strict=False ).cast( pl.Int64, strict=False ) ]
+        )
+
+    # makeTimeIndex - ms timestamps to UTC datetimes, sorted by open time
+    lf = lf.with_columns(
+        [ pl.from_epoch( pl.col( c ).cast( pl.Int64 ), time_unit="ms" ).cast( pl.Datetime( "ms", "UTC" ) ) for c in [ "open_time", "close_time" ] ]
+        ).sort( "open_time", maintain_order=True )
+
+    # dropDupes - keep last row per open time (per bar id for trade bars)
+    key = "bar_id" if "bar_id" in lf.collect_schema().names() else "open_time"
+    lf  = lf.unique( subset=[ key ], keep="last", maintain_order=True )
+
+    # checkOHLC - swap high/low where inverted...
+    swapped = pl.col( "high" ) < pl.col( "low" )
+    lf = lf.with_columns(
+        pl.when( swapped ).then( pl.col( "low" ) ).otherwise( pl.col( "high" ) ).alias( "high" ),
+        pl.when( swapped ).then( pl.col( "high" ) ).otherwise( pl.col( "low" ) ).alias( "low" )
+        )
+
+    # ...then clamp to the open/close bounds
+    max_oc = pl.max_horizontal( "open", "close" )
+    min_oc = pl.min_horizontal( "open", "close" )
+    lf = lf.with_columns(
+        pl.when( pl.col( "high" ) < max_oc ).then( max_oc ).otherwise( pl.col( "high" ) ).alias( "high" ),
+        pl.when( pl.col( "low" ) > min_oc ).then( min_oc ).otherwise( pl.col( "low" ) ).alias( "low" )
+        )
+
+    # removeNegsAndNaNs - nulls/NaNs, non-positive OHLC, negative volume
+    lf = lf.filter(
+        pl.all_horizontal( [ pl.col( c ).is_not_null() & pl.col( c ).is_not_nan() for c in NUM_COLS ] )
+        & ( pl.col( "open" ) > 0 ) & ( pl.col( "high" ) > 0 ) & ( pl.col( "low" ) > 0 ) & ( pl.col( "close" ) > 0 )
+        & ( pl.col( "volume" ) >= 0 )
+        )
+
+    return lf
+
+
+def exprFuturePriceColumn(
+        steps
+        ):
+    """
+    Expressions for manual_indicators.addFuturePriceColumn
+    """
+
+    future = pl.col( "close" ).shift( -steps )
+
+    return [
+        [ future.alias( "future_price" ) ],
+        [ ( ( pl.col( "future_price" ) - pl.col( "close" ) ) / pl.col( "close" ) ).alias( "pct_change" ) ]
+        ]
+
+
+def exprBinaryLabel(
+        threshold
+        ):
+    """
+    Expressions for manual_indicators.addBinaryLabel, NaN change -> 0
+    """
+
+    return [ [ ( pl.col( "pct_change" ) >= threshold ).fill_null( False ).cast( pl.Int64 ).alias( "binary_label" ) ] ]
+
+
+def exprEMA(
+        lower_period,
+        upper_period
+        ):
+    """
+    Expressions for manual_indicators.addEMA
+    """
+
+    return [ [
+        pl.col( "close" ).ewm_mean( span=p, adjust=False ).shift( 1 ).alias( f"ema_{p}" ) for p in ( lower_period, upper_period )
+        ] ]
+
+
+def exprMomIndicator(
+        lower_period,
+        upper_period
+        ):
+    """
+    Expressions for manual_indicators.addMomIndicator
+    """
+
+    return [ [
+        pl.col( "close" ).diff( p ).shift( 1 ).alias( f"momentum_{p}" ) for p in ( lower_period, upper_period )
+        ] ]
+
+
+def exprMACD(
+        lower_period,
+        upper_period,
+        signal_period
+        ):
+    """
+    Expressions for manual_indicators.addMACD
+    """
+
+    macd   = pl.col( "close" ).ewm_mean( span=lower_period, adjust=False ) - pl.col( "close" ).ewm_mean( span=upper_period, adjust=False )
+    signal = macd.ewm_mean( span=signal_period, adjust=False )
+
+    return [ [ macd.shift( 1 ).alias( "macd" ), signal.shift( 1 ).alias( "macd_signal" ) ] ]
+
+
+def exprBB(
+        period
+        ):
+    """
+    Expressions for manual_indicators.addBB
+    """
+
+    mean = pl.col( f"bb_{period}_mean" )
+    std  = pl.col( f"bb_{period}_std" )
+
+    return [
+        [ pl.col( "close" ).rolling_mean( period ).shift( 1 ).alias( f"bb_{period}_mean" ),
+          pl.col( "close" ).rolling_std( period ).shift( 1 ).alias( f"bb_{period}_std" ) ],
+        [ ( mean + 2 * std ).alias( f"bb_{period}_upper" ),
+          ( mean - 2 * std ).alias( f"bb_{period}_lower" ) ]
+        ]
+
+
+def exprRSI(
+        RSI_period
+        ):
+    """
+    Expressions for manual_indicators.addRSI
+    """
+
+    delta    = pl.col( "close" ).diff()
+    avg_gain = delta.clip( lower_bound=0 ).rolling_mean( RSI_period )
+    avg_loss = ( -delta.clip( upper_bound=0 ) ).rolling_mean( RSI_period )
+    rs       = avg_gain / avg_loss
+
+    return [ [ ( 100 - ( 100 / ( 1 + rs ) ) ).shift( 1 ).alias( "rsi" ) ] ]
+
+
+def exprATR(
+        ATR_period
+        ):
+    """
+    Expressions for manual_indicators.addATR
+    """
+
+    prev_close = pl.col( "close" ).shift()
+    true_range = pl.max_horizontal(
+        pl.col( "high" ) - pl.col( "low" ),
+        ( pl.col( "high" ) - prev_close ).abs(),
+        ( pl.col( "low" ) - prev_close ).abs()
+        )
+
+    return [ [ true_range.ewm_mean( span=ATR_period, adjust=False ).shift( 1 ).alias( "atr" ) ] ]
+
+
+def exprOBV():
+    """
+    Expressions for manual_indicators.addOBV
+    """
+
+    signed = ( pl.col( "close" ).diff().sign() * pl.col( "volume" ) ).fill_null( 0 ).fill_nan( 0 )
+
+    return [ [ signed.cum_sum().alias( "obv" ) ] ]
+
+
+def exprStochasticOsc(
+        period,
+        smooth_period
+        ):
+    """
+    Expressions for manual_indicators.addStochasticOsc
+    """
+
+    lowest_low   = pl.col( "low" ).rolling_min( period )
+    highest_high = pl.col( "high" ).rolling_max( period )
+    k            = 100 * ( ( pl.col( "close" ) - lowest_low ) / ( highest_high - lowest_low ) ).shift( 1 )
+
+    return [
+        [ k.alias( f"stoch_k_{period}" ) ],
+        [ pl.col( f"stoch_k_{period}" ).rolling_mean( smooth_period ).alias( f"stoch_d_{period}" ) ]
+        ]
+
+
+def exprCCI(
+        period
+        ):
+    """
+    Expressions for manual_indicators.addCCI. The mean absolute deviation
+    from the window's mean is a sum over the 'period' lags of the typical
+    price, so it runs as vectorised column expressions rather than a
+    Python call per window.
+    """
+
+    typical_price = ( pl.col( "high" ) + pl.col( "low" ) + pl.col( "close" ) ) / 3
+    mean_tp       = typical_price.rolling_mean( period )
+    mad_tp        = pl.sum_horizontal( [ ( typical_price.shift( k ) - mean_tp ).abs() for k in range( period ) ] ) / period
+
+    # Flat windows give NaN, as manual_indicators
+    flat   = typical_price.rolling_max( period ) == typical_price.rolling_min( period )
+    mad_tp = pl.when( flat ).then( float( "nan" ) ).otherwise( mad_tp )
+
+    return [ [ ( ( typical_price - mean_tp ) / ( 0.015 * mad_tp ) ).shift( 1 ).alias( "cci" ) ] ]
+
+
+def exprVWAP(
+        period,
+        has_cumulative=False
+        ):
+    """
+    Expressions for manual_indicators.addVWAP. The cumulative VWAP is only
+    added once, as in the pandas version.
+    """
+
+    price_vol = pl.col( "volume" ) * pl.col( "close" )
+    denom     = pl.col( "volume" ).rolling_sum( period )
+    denom     = pl.when( denom == 0 ).then( None ).otherwise( denom )
+
+    exprs = [ ( price_vol.rolling_sum( period ) / denom ).shift( 1 ).alias( f"vwap_{period}" ) ]
+    if not has_cumulative:
+        exprs.insert( 0, ( price_vol.cum_sum() / pl.col( "volume" ).cum_sum() ).shift( 1 ).alias( "vwap_cumulative" ) )
+
+    return [ exprs ]
+
+
+def exprRollingStats(
+        period
+        ):
+    """
+    Expressions for manual_indicators.addRollingStats
+    """
+
+    close = pl.col( "close" )
+
+    return [ [
+        close.rolling_mean( period ).shift( 1 ).alias( f"rolling_mean_{period}" ),
+        close.rolling_std( period ).shift( 1 ).alias( f"rolling_std_{period}" ),
+        close.rolling_min( period ).shift( 1 ).alias( f"rolling_min_{period}" ),
+        close.rolling_max( period ).shift( 1 ).alias( f"rolling_max_{period}" )
+        ] ]
+
+
+def exprZScore(
+        period
+        ):
+    """
+    Expressions for manual_indicators.addZScore, flat windows give NaN
+    """
+
+    mean = pl.col( "close" ).rolling_mean( period )
+    std  = pl.col( "close" ).rolling_std( period )
+    flat = pl.col( "close" ).rolling_max( period ) == pl.col( "close" ).rolling_min( period )
+    std  = pl.when( flat ).then( float( "nan" ) ).otherwise( std )
+
+    return [ [ ( ( pl.col( "close" ) - mean ) / std ).shift( 1 ).alias( f"zscore_{period}" ) ] ]
+
+
+def exprLaggedReturn(
+        period
+        ):
+    """
+    Expressions for manual_indicators.addLaggedReturn
+    """
+
+    return [ [ pl.col( "close" ).pct_change( period ).shift( 1 ).alias( f"return_lag_{period}" ) ] ]
+
+
+# manual_indicators function name -> expression builder
+EXPR_BUILDERS = {
+    "addFuturePriceColumn": exprFuturePriceColumn,
+    "addBinaryLabel":       exprBinaryLabel,
+    "addEMA":               exprEMA,
+    "addMomIndicator":      exprMomIndicator,
+    "addMACD":              exprMACD,
+    "addBB":                exprBB,
+    "addRSI":               exprRSI,
+    "addATR":               exprATR,
+    "addOBV":               exprOBV,
+    "addStochasticOsc":     exprStochasticOsc,
+    "addCCI":               exprCCI,
+    "addVWAP":              exprVWAP,
+    "addRollingStats":      exprRollingStats,
+    "addZScore":            exprZScore,
+    "addLaggedReturn":      exprLaggedReturn,
+}
+
+
+def indicatorsLazy(
+        lf,
+        indicators
+        ):
+    """
+    Add indicator columns to a LazyFrame. Each builder returns stages of
+    expressions, later stages may use columns from earlier ones; polars
+    fuses the resulting with_columns calls into one plan.
+
+    Args:
+        lf:
+            Cleaned LazyFrame sorted by open_time
+        indicators:
+            Ordered list of ( function_name, kwargs ) pairs as used by
+            chunked_indicators.computeIndicatorsChunked
+    Returns:
+        lf:
+            LazyFrame with indicator columns
+    """
+
+    requirePolars()
+
+    has_cumulative = "vwap_cumulative" in lf.collect_schema().names()
+
+    for name, kwargs in indicators:
+        if name not in EXPR_BUILDERS:
+            raise ValueError( f"(POLARS) indicatorsLazy: no polars expression for {name}" )
+
+        # VWAP cumulative only computed once
+        if name == "addVWAP":
+            stages = exprVWAP( **kwargs, has_cumulative=has_cumulative )
+            has_cumulative = True
+        else:
+            stages = EXPR_BUILDERS[ name ]( **kwargs )
+
+        for exprs in stages:
+            lf = lf.with_columns( exprs )
+
+    return lf
@@ -0,0 +1,253 @@
+"""
+" TA-Lib versions of the indicators in manual_indicators, same column
+" names and shift(1) alignment, built from TA-Lib's C primitives so
+" the definitions stay the repo's own
+"
+" Where TA-Lib's defaults differ from manual_indicators they are not
+" used directly: RSI and ATR in TA-Lib use Wilder smoothing (here: SMA
+" RSI and span EMA of the true range), BBANDS uses population std (here:
+" sample std), OBV starts at the first volume (here: at 0). EMAs run in
+" Metastock compatibility so they are seeded with the first value like
+" ewm( adjust=False ); TA-Lib still returns NaN for the first period-1
+" rows, so warm-up rows differ from pandas (see backend_selection.parity).
+"
+" @author: Michael Kane
+" @date:   29/10/2025
+"""
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import talib
+except ImportError:
+    talib = None
+
+# TA-Lib's compatibility setting is process wide, held while it is changed
+_COMPATIBILITY_LOCK = threading.Lock()
+
+
+def available():
+    """
+    True when TA-Lib can be imported
+    """
+
+    return talib is not None
+
+
+def requireTalib():
+    """
+    Raise a helpful error if TA-Lib is not installed
+    """
+
+    if talib is None:
+        raise ImportError( "(TALIB) TA-Lib is required for the talib backend: pip install TA-Lib" )
+
+
+def _values(
+        df,
+        column
+        ):
+    """
+    Contiguous float64 array, as TA-Lib requires
+    """
+
+    return np.ascontiguousarray( df[ column ].to_numpy( dtype=np.float64 ) )
+
+
+def _shifted(
+        df,
+        values
+        ):
+    """
+    Wrap a TA-Lib output as a Series on df's index, shift(1)-ed
+    """
+
+    return pd.Series( values, index=df.index ).shift( 1 )
+
+
+@contextmanager
+def _metastock():
+    """
+    Seed EMAs with the first value instead of an SMA, restoring the
+    global TA-Lib setting afterwards. Calls from this module are
+    serialised by a lock; other code calling TA-Lib in another thread
+    meanwhile sees the Metastock setting, so don't run it concurrently.
+    """
+
+    with _COMPATIBILITY_LOCK:
+        previous = talib.get_compatibility()
+        talib.set_compatibility( 1 )
+        try:
+            yield
+        finally:
+            talib.set_compatibility( previous )
+
+
+def _ema(
+        values,
+        period
+        ):
+    """
+    EMA with adjust=False recurrence
+    """
+
+    with _metastock():
+        return talib.EMA( values, timeperiod=period )
+
+
+def addEMA(
+        df,
+        lower_period,
+        upper_period
+        ):
+    """ TA-Lib manual_indicators.addEMA """
+
+    close = _values( df, "close" )
+
+    df[ f"ema_{lower_period}" ] = _shifted( df, _ema( close, lower_period ) )
+    df[ f"ema_{upper_period}" ] = _shifted( df, _ema( close, upper_period ) )
+
+    return df
+
+
+def addMACD(
+        df,
+        lower_period,
+        upper_period,
+        signal_period
+        ):
+    """ TA-Lib manual_indicators.addMACD """
+
+    close = _values( df, "close" )
+
+    # Signal EMA starts at the first valid MACD value
+    macd   = _ema( close, lower_period ) - _ema( close, upper_period )
+    signal = _ema( macd, signal_period )
+
+    df[ "macd" ]        = _shifted( df, macd )
+    df[ "macd_signal" ] = _shifted( df, signal )
+
+    return df
+
+
+def addBB(
+        df,
+        period
+        ):
+    """ TA-Lib manual_indicators.addBB """
+
+    close = _values( df, "close" )
+
+    # STDDEV is population std, rescale to sample std as pandas
+    mean = talib.SMA( close, timeperiod=period )
+    std  = talib.STDDEV( close, timeperiod=period, nbdev=1 ) * np.sqrt( period / ( period - 1 ) )
+
+    df[ f"bb_{period}_mean" ]  = _shifted( df, mean )
+    df[ f"bb_{period}_std" ]   = _shifted( df, std )
+    df[ f"bb_{period}_upper" ] = df[ f"bb_{period}_mean" ] + 2 * df[ f"bb_{period}_std" ]
+    df[ f"bb_{period}_lower" ] = df[ f"bb_{period}_mean" ] - 2 * df[ f"bb_{period}_std" ]
+
+    return df
+
+
+def addRSI(
+        df,
+        RSI_period
+        ):
+    """ TA-Lib manual_indicators.addRSI (SMA of gains/losses, not Wilder) """
+
+    delta = np.diff( _values( df, "close" ), prepend=np.nan )
+
+    # Leading NaN is skipped by TA-Lib, as rolling().mean() does
+    avg_gain = talib.SMA( np.clip( delta, 0, None ), timeperiod=RSI_period )
+    avg_loss = talib.SMA( -np.clip( delta, None, 0 ), timeperiod=RSI_period )
+
+    with np.errstate( divide="ignore", invalid="ignore" ):
+        rs = avg_gain / avg_loss
+
+    df[ "rsi" ] = _shifted( df, 100 - ( 100 / ( 1 + rs ) ) )
+
+    return df
+
+
+def addATR(
+        df,
+        ATR_period
+        ):
+    """ TA-Lib manual_indicators.addATR (span EMA of true range, not Wilder) """
+
+    high, low = _values( df, "high" ), _values( df, "low" )
+    prev      = np.concatenate( [ [ np.nan ], _values( df, "close" )[ :-1 ] ] )
+
+    # TRANGE is NaN on the first row, pandas takes high-low there
+    true_range = np.fmax( high - low, np.fmax( np.abs( high - prev ), np.abs( low - prev ) ) )
+
+    df[ "atr" ] = _shifted( df, _ema( np.ascontiguousarray( true_range ), ATR_period ) )
+
+    return df
+
+
+def addOBV(
+        df
+        ):
+    """ TA-Lib manual_indicators.addOBV (unshifted, starts at 0) """
+
+    volume = _values( df, "volume" )
+
+    df[ "obv" ] = pd.Series( talib.OBV( _values( df, "close" ), volume ) - volume[ 0 ], index=df.index )
+
+    return df
+
+
+def addStochasticOsc(
+        df,
+        period,
+        smooth_period
+        ):
+    """ TA-Lib manual_indicators.addStochasticOsc """
+
+    lowest_low   = talib.MIN( _values( df, "low" ), timeperiod=period )
+    highest_high = talib.MAX( _values( df, "high" ), timeperiod=period )
+
+    with np.errstate( divide="ignore", invalid="ignore" ):
+        k = 100 * ( ( _values( df, "close" ) - lowest_low ) / ( highest_high - lowest_low ) )
+
+    # %D is an SMA of the already shifted %K, rolling as pandas so a NaN
+    # %K from a flat window only blanks the windows that contain it
+    df[ f"stoch_k_{period}" ] = _shifted( df, k )
+    df[ f"stoch_d_{period}" ] = df[ f"stoch_k_{period}" ].rolling( window=smooth_period ).mean()
+
+    return df
+
+
+def addCCI(
+        df,
+        period
+        ):
+    """ TA-Lib manual_indicators.addCCI, same typical price / mean deviation definition """
+
+    high, low, close = _values( df, "high" ), _values( df, "low" ), _values( df, "close" )
+    typical_price    = np.ascontiguousarray( ( high + low + close ) / 3 )
+
+    # TA-Lib gives 0 for a flat window, manual_indicators gives NaN
+    cci = talib.CCI( high, low, close, timeperiod=period )
+    cci[ talib.MAX( typical_price, timeperiod=period ) == talib.MIN( typical_price, timeperiod=period ) ] = np.nan
+
+    df[ "cci" ] = _shifted( df, cci )
+
+    return df
+
+
+# manual_indicators function name -> TA-Lib version
+TALIB_INDICATORS = {
+    "addEMA":           addEMA,
+    "addMACD":          addMACD,
+    "addBB":            addBB,
+    "addRSI":           addRSI,
+    "addATR":           addATR,
+    "addOBV":           addOBV,
+    "addStochasticOsc": addStochasticOsc,
+    "addCCI":           addCCI,
+}
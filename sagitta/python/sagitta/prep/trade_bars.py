@@ -0,0 +1,185 @@
+"""
+" Build tick, volume and dollar bars from aggregated trades, streamed
+" from Parquet and bucketed with cumulative sums
+"
+" Output columns and layout match klines_to_dataframe.convertKlinesToDataframe
+" (times in epoch ms) so clean_data and manual_indicators run unchanged,
+" plus a 'bar_id' sequence column. Open times are the real first trade
+" times, so several bars may share one; clean_data.dropDupes keys on
+" bar_id when it is present so none of them are dropped
+"
+" @author: Michael Kane
+" @date:   27/10/2025
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+BAR_TYPES = ( "tick", "volume", "dollar" )
+
+# Same columns, same order, as convertKlinesToDataframe, then bar_id
+BAR_SCHEMA = pa.schema( [
+    ( "open_time",          pa.int64()   ),
+    ( "open",               pa.float64() ),
+    ( "high",               pa.float64() ),
+    ( "low",                pa.float64() ),
+    ( "close",              pa.float64() ),
+    ( "volume",             pa.float64() ),
+    ( "close_time",         pa.int64()   ),
+    ( "quote_asset_volume", pa.float64() ),
+    ( "number_of_trades",   pa.int64()   ),
+    ( "taker_buy_base",     pa.float64() ),
+    ( "taker_buy_quote",    pa.float64() ),
+    ( "bar_id",             pa.int64()   ),
+] )
+
+TRADE_COLUMNS = [ "price", "qty", "first_id", "last_id", "time", "is_buyer_maker" ]
+
+
+def _barIds(
+        trades,
+        bar_type,
+        threshold,
+        offset
+        ):
+    """
+    Bar index per trade: the bar a trade falls in is the number of whole
+    thresholds filled before it, so the trade that crosses a threshold
+    closes its bar. 'offset' is the measure already filled, modulo the
+    threshold, before the first trade, which keeps the cumulative sum
+    small however long the stream is.
+
+    Returns:
+        bar_ids:
+            Bar index per trade, the first trade's bar is 0
+        filled_before:
+            Measure filled before each trade, including 'offset'
+    """
+
+    if bar_type == "tick":
+        measure = np.ones( len( trades[ "price" ] ) )
+    elif bar_type == "volume":
+        measure = trades[ "qty" ]
+    else:
+        measure = trades[ "price" ] * trades[ "qty" ]
+
+    filled_before = offset + np.cumsum( measure ) - measure
+
+    return np.floor( filled_before / threshold ).astype( np.int64 ), filled_before
+
+
+def _aggregate(
+        trades,
+        starts
+        ):
+    """
+    Reduce trades into bars starting at 'starts' with ufunc.reduceat,
+    no per-bar Python loop
+    """
+
+    price, qty = trades[ "price" ], trades[ "qty" ]
+    ends       = np.append( starts[ 1: ], len( price ) ) - 1
+    quote      = price * qty
+    taker_buy  = ~trades[ "is_buyer_maker" ]
+
+    return {
+        "open_time":          trades[ "time" ][ starts ],
+        "open":               price[ starts ],
+        "high":               np.maximum.reduceat( price, starts ),
+        "low":                np.minimum.reduceat( price, starts ),
+        "close":              price[ ends ],
+        "volume":             np.add.reduceat( qty, starts ),
+        "close_time":         trades[ "time" ][ ends ],
+        "quote_asset_volume": np.add.reduceat( quote, starts ),
+        "number_of_trades":   np.add.reduceat( trades[ "last_id" ] - trades[ "first_id" ] + 1, starts ),
+        "taker_buy_base":     np.add.reduceat( np.where( taker_buy, qty, 0.0 ), starts ),
+        "taker_buy_quote":    np.add.reduceat( np.where( taker_buy, quote, 0.0 ), starts ),
+        }
+
+
+def buildBars(
+        in_path,
+        out_path,
+        bar_type,
+        threshold,
+        batch_size=5_000_000
+        ):
+    """
+    Stream aggregated trades from Parquet into tick, volume or dollar
+    bars. Trades in the last, still open bar of each batch are carried
+    into the next batch; the final open bar is written at the end.
+
+    Args:
+        in_path:
+            Parquet of aggregated trades, e.g. from
+            fetch_trades.fetchAggTradesToParquet, or a list of part files
+            in trade order (a download resumed after a TradeFetchError)
+        out_path:
+            Parquet file to write bars to
+        bar_type:
+            "tick" (trade count), "volume" (base quantity) or "dollar"
+            (quote value)
+        threshold:
+            Amount of the bar measure that closes a bar
+        batch_size:
+            Trades read per batch
+    Returns:
+        n_bars:
+            Number of bars written
+    """
+
+    if bar_type not in BAR_TYPES:
+        raise ValueError( f"(BARS) Invalid bar type {bar_type}, expected one of {BAR_TYPES}" )
+    if threshold <= 0:
+        raise ValueError( f"(BARS) Threshold must be positive, got {threshold}" )
+
+    print( f" [PREP] Building {bar_type} bars of {threshold} from {in_path}... " )
+
+    paths   = [ in_path ] if isinstance( in_path, str ) else list( in_path )
+    carry   = None
+    offset  = 0.0
+    n_bars  = 0
+
+    def write( writer, trades, starts ):
+        nonlocal n_bars
+        bars = _aggregate( trades, starts )
+        bars[ "bar_id" ] = n_bars + np.arange( len( starts ), dtype=np.int64 )
+        writer.write_table( pa.table( bars, schema=BAR_SCHEMA ) )
+        n_bars += len( starts )
+
+    with pq.ParquetWriter( out_path, BAR_SCHEMA ) as writer:
+        batches = ( b for path in paths for b in pq.ParquetFile( path ).iter_batches( batch_size=batch_size, columns=TRADE_COLUMNS ) )
+        for batch in batches:
+
+            trades = { c: batch.column( c ).to_numpy( zero_copy_only=False ) for c in TRADE_COLUMNS }
+
+            # Prepend trades of the bar left open by the previous batch
+            if carry is not None:
+                trades = { c: np.concatenate( [ carry[ c ], trades[ c ] ] ) for c in TRADE_COLUMNS }
+
+            if len( trades[ "price" ] ) == 0:
+                continue
+
+            # Bar boundaries wherever the bar index changes
+            bar_ids, filled_before = _barIds( trades, bar_type, threshold, offset )
+            starts  = np.concatenate( [ [ 0 ], np.flatnonzero( np.diff( bar_ids ) ) + 1 ] )
+
+            # Everything but the last bar is complete
+            if len( starts ) > 1:
+                complete = starts[ -1 ]
+                write( writer, { c: v[ :complete ] for c, v in trades.items() }, starts[ :-1 ] )
+                carry = { c: v[ complete: ] for c, v in trades.items() }
+
+                # Remainder already filled when the open bar started
+                offset = filled_before[ complete ] - threshold * bar_ids[ complete ]
+            else:
+                carry = trades
+
+        # Final, possibly partial, bar
+        if carry is not None and len( carry[ "price" ] ) > 0:
+            write( writer, carry, np.array( [ 0 ] ) )
+
+    print( f" [PREP] Wrote {n_bars} bars to {out_path}" )
+
+    return n_bars
@@ -0,0 +1,288 @@
+"""
+" Purged and embargoed walk-forward cross validation over a feature
+" store, folds fitted in parallel processes sharing the memory-mapped
+" matrix and cached per fold
+"
+" @author: Michael Kane
+" @date:   28/10/2025
+"""
+import hashlib, json, os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sagitta.training import tuning
+from sagitta.utils import io
+
+
+def walkForwardFolds(
+        n_rows,
+        n_folds,
+        steps,
+        embargo=0,
+        min_train=None,
+        max_train=None
+        ):
+    """
+    Walk-forward folds as index arrays into the feature matrix. The rows
+    after 'min_train' are cut into 'n_folds' consecutive test blocks and
+    each fold trains only on rows before its test block.
+
+    Labels from addFuturePriceColumn( steps ) at row i use the close at
+    i + steps, so the last 'steps' rows before a test block are purged
+    from training. A further 'embargo' rows are dropped after the purge
+    because rolling features at the start of the test block still
+    overlap the end of the training rows.
+     ___________________________________________
+    |__train__|__purge(steps)__|_embargo_|_test_|
+
+    Args:
+        n_rows:
+            Number of rows in the feature matrix
+        n_folds:
+            Number of test blocks
+        steps:
+            Label horizon, e.g. index["steps"] from the feature store
+        embargo:
+            Extra rows dropped between training and test
+        min_train:
+            Rows before the first test block, defaults to one block
+        max_train:
+            Cap on training rows for a rolling window, None expands
+    Returns:
+        folds:
+            List of dicts with 'fold', 'train' and 'test' index arrays
+    """
+
+    min_train = min_train if min_train is not None else n_rows // ( n_folds + 1 )
+    bounds    = np.linspace( min_train, n_rows, n_folds + 1 ).astype( np.int64 )
+    folds     = []
+
+    for k in range( n_folds ):
+        test_start, test_stop = bounds[ k ], bounds[ k+1 ]
+        train_stop  = test_start - steps - embargo
+        train_start = 0 if max_train is None else max( 0, train_stop - max_train )
+
+        if train_stop <= train_start or test_stop <= test_start:
+            raise ValueError( f"(CV) Fold {k} has no training or test rows, reduce n_folds, steps or embargo" )
+
+        folds.append( {
+            "fold":  k,
+            "train": np.arange( train_start, train_stop ),
+            "test":  np.arange( test_start, test_stop ),
+            } )
+
+    return folds
+
+
+def _rows(
+        matrix,
+        idx
+        ):
+    """
+    Rows of the matrix for an index array, a view when the rows are
+    consecutive (always the case for walk-forward folds)
+    """
+
+    if len( idx ) and idx[-1] - idx[0] + 1 == len( idx ):
+        return matrix[ idx[0] : idx[-1] + 1 ]
+
+    return matrix[ idx ]
+
+
+def _foldData(
+        matrix,
+        index,
+        idx,
+        cols
+        ):
+    """
+    Features and labels of one fold, rows with a missing feature or
+    label (indicator warm-up, last 'steps' rows) removed
+    """
+
+    rows = _rows( matrix, idx )
+    X    = rows[ :, cols ]
+    y    = rows[ :, index[ "label" ] ]
+
+    valid = np.isfinite( X ).all( axis=1 ) & np.isfinite( y )
+
+    return X[ valid ], y[ valid ].astype( np.int64 )
+
+
+def _scores(
+        model,
+        X
+        ):
+    """
+    Continuous scores for ROC AUC from whichever the model provides
+    """
+
+    if hasattr( model, "decision_function" ):
+        return model.decision_function( X )
+
+    return model.predict_proba( X )[ :, 1 ]
+
+
+def _fitFold(
+        args
+        ):
+    """
+    Worker: fit one model on one fold and score it on the test block.
+    The store is opened here so every process maps the same pages.
+    """
+
+    store_dir, name, model, fold, cols = args
+    matrix, index = tuning.loadFeatureStore( store_dir )
+
+    X_train, y_train = _foldData( matrix, index, fold[ "train" ], cols )
+    X_test,  y_test  = _foldData( matrix, index, fold[ "test" ], cols )
+
+    result = {
+        "model":   name,
+        "fold":    fold[ "fold" ],
+        "n_train": len( y_train ),
+        "n_test":  len( y_test ),
+        "roc_auc": np.nan,
+        "accuracy": np.nan,
+        }
+
+    if len( np.unique( y_train ) ) < 2 or len( y_test ) == 0:
+        print( f" [CV] {name} fold {fold['fold']}: not enough labelled rows, skipped" )
+        return result
+
+    model = clone( model ).fit( X_train, y_train )
+
+    result[ "accuracy" ] = float( accuracy_score( y_test, model.predict( X_test ) ) )
+    if len( np.unique( y_test ) ) == 2:
+        result[ "roc_auc" ] = float( roc_auc_score( y_test, _scores( model, X_test ) ) )
+
+    return result
+
+
+def _storeFingerprint(
+        store_dir,
+        index
+        ):
+    """
+    Content hash written by buildFeatureStore, or the matrix file's size
+    and modification time for stores built before it was recorded
+    """
+
+    if "fingerprint" in index:
+        return index[ "fingerprint" ]
+
+    stat = os.stat( os.path.join( store_dir, tuning.MATRIX_FILE ) )
+
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _cacheKey(
+        name,
+        model,
+        fold,
+        cols,
+        index,
+        fingerprint
+        ):
+    """
+    Hash of everything that decides a fold's result, so a changed model,
+    fold layout, feature set or store contents gets a fresh entry
+    """
+
+    key = {
+        "name":   name,
+        "model":  repr( sorted( model.get_params( deep=True ).items(), key=lambda kv: kv[0] ) ),
+        "train":  [ int( fold[ "train" ][0] ), int( fold[ "train" ][-1] ) ],
+        "test":   [ int( fold[ "test" ][0] ), int( fold[ "test" ][-1] ) ],
+        "cols":   [ int( c ) for c in cols ],
+        "store":  [ index[ "steps" ], index[ "threshold" ], index[ "columns" ], fingerprint ],
+        }
+
+    return hashlib.sha1( json.dumps( key, sort_keys=True ).encode() ).hexdigest()
+
+
+def runCrossValidation(
+        store_dir,
+        models,
+        n_folds=5,
+        embargo=0,
+        columns=None,
+        min_train=None,
+        max_train=None,
+        n_workers=None,
+        use_cache=True
+        ):
+    """
+    Purged walk-forward cross validation of several models over a
+    feature store built by tuning.buildFeatureStore. Every ( model, fold )
+    pair runs in a worker process on the shared memory map, and results
+    are cached in the store so only new models or folds are fitted.
+
+    Args:
+        store_dir:
+            Feature store directory
+        models:
+            Dict of name -> unfitted sklearn estimator (cloned per fold)
+        n_folds:
+            Number of walk-forward test blocks
+        embargo:
+            Rows dropped after the purge, see walkForwardFolds
+        columns:
+            Matrix column indices to use, defaults to every feature
+        min_train, max_train:
+            As walkForwardFolds
+        n_workers:
+            Number of worker processes, defaults to the CPU count
+        use_cache:
+            Read and write per-fold results in <store_dir>/cv_cache
+    Returns:
+        results:
+            DataFrame with one row per model and fold
+    """
+
+    matrix, index = tuning.loadFeatureStore( store_dir )
+    cols  = list( columns ) if columns is not None else [ i for i in range( matrix.shape[1] ) if i != index[ "label" ] ]
+    folds = walkForwardFolds( matrix.shape[0], n_folds, index[ "steps" ], embargo, min_train, max_train )
+    del matrix
+
+    cache_dir   = os.path.join( store_dir, tuning.CACHE_DIR )
+    fingerprint = _storeFingerprint( store_dir, index )
+    os.makedirs( cache_dir, exist_ok=True )
+
+    # Split into cached results and folds still to run
+    results, tasks, keys = [], [], []
+    for name, model in models.items():
+        for fold in folds:
+            key  = _cacheKey( name, model, fold, cols, index, fingerprint )
+            path = os.path.join( cache_dir, f"{key}.json" )
+
+            if use_cache and os.path.exists( path ):
+                results.append( io.load_JSON( path ) )
+            else:
+                tasks.append( ( store_dir, name, model, fold, cols ) )
+                keys.append( path )
+
+    print( f" [CV] {len(models)} models x {n_folds} folds, {len(results)} cached, {len(tasks)} to run" )
+
+    if tasks:
+        n_workers = min( n_workers or os.cpu_count(), len( tasks ) )
+
+        with ProcessPoolExecutor( max_workers=n_workers ) as pool:
+            for path, result in zip( keys, pool.map( _fitFold, tasks ) ):
+                results.append( result )
+
+                if use_cache:
+                    # Write then rename so an interrupted run leaves no partial entry
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    with open( tmp, "w" ) as f:
+                        json.dump( result, f )
+                    os.replace( tmp, path )
+
+    results = pd.DataFrame( results ).sort_values( [ "model", "fold" ] ).reset_index( drop=True )
+
+    for name, scores in results.groupby( "model" )[ "roc_auc" ]:
+        print( f" [CV] {name}: ROC AUC {scores.mean():.4f} +/- {scores.std():.4f}" )
+
+    return results
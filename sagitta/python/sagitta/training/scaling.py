@@ -0,0 +1,382 @@
+"""
+" Streaming per-column scaling statistics (Welford mean/variance, min,
+" max and approximate quantiles) that are updated chunk by chunk, merged
+" across chunks and pairs, and saved with the feature store
+"
+" @author: Michael Kane
+" @date:   29/10/2025
+"""
+import hashlib, os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sagitta.training import tuning
+
+
+# Rows sampled by _rowsFingerprint
+FINGERPRINT_ROWS = 256
+
+
+def _compress(
+        values,
+        weights,
+        max_points
+        ):
+    """
+    Shrink a sorted weighted sample to at most 'max_points' centroids.
+    Buckets follow the t-digest arcsine scale, so the tails keep more
+    resolution than the middle.
+    """
+
+    total = weights.sum()
+    if len( values ) <= max_points or total == 0:
+        return values, weights
+
+    mid    = ( np.cumsum( weights ) - weights / 2 ) / total
+    bucket = np.minimum( ( max_points * ( np.arcsin( 2 * mid - 1 ) / np.pi + 0.5 ) ).astype( np.int64 ), max_points - 1 )
+
+    sums   = np.bincount( bucket, weights=weights * values, minlength=max_points )
+    counts = np.bincount( bucket, weights=weights, minlength=max_points )
+    keep   = counts > 0
+
+    return sums[ keep ] / counts[ keep ], counts[ keep ]
+
+
+class StreamingScaler:
+    """
+    Per-column count, mean, M2 (sum of squared deviations), min, max and
+    a quantile sketch for a matrix seen in blocks. NaN/inf are ignored so
+    warm-up rows don't need dropping first.
+
+    Args:
+        n_columns:
+            Number of columns
+        max_points:
+            Centroids kept per column for quantiles, more is more accurate
+        columns:
+            Optional column names, saved with the scaler
+    """
+
+    def __init__( self, n_columns, max_points=200, columns=None ):
+        self.max_points  = max_points
+        self.columns     = columns
+        self.fingerprint = None
+        self.n_rows      = 0
+        self.count      = np.zeros( n_columns )
+        self.mean       = np.zeros( n_columns )
+        self.m2         = np.zeros( n_columns )
+        self.min        = np.full( n_columns, np.inf )
+        self.max        = np.full( n_columns, -np.inf )
+        self.sketch     = [ ( np.empty( 0 ), np.empty( 0 ) ) for _ in range( n_columns ) ]
+
+    def _combine( self, count, mean, m2 ):
+        """ Chan et al. pairwise update of count/mean/M2 """
+
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate( divide="ignore", invalid="ignore" ):
+            share = np.where( total > 0, count / total, 0.0 )
+        self.mean  = self.mean + delta * share
+        self.m2    = self.m2 + m2 + delta * delta * self.count * share
+        self.count = total
+
+    def update( self, block ):
+        """
+        Add a ( rows, columns ) block, e.g. a chunk or a single new candle
+        """
+
+        block  = np.asarray( block, dtype=np.float64 ).reshape( -1, len( self.count ) )
+        finite = np.isfinite( block )
+        count  = finite.sum( axis=0 ).astype( np.float64 )
+        values = np.where( finite, block, 0.0 )
+
+        with np.errstate( divide="ignore", invalid="ignore" ):
+            mean = np.where( count > 0, values.sum( axis=0 ) / count, 0.0 )
+        m2 = ( np.where( finite, block - mean, 0.0 ) ** 2 ).sum( axis=0 )
+
+        self._combine( count, mean, m2 )
+        self.min     = np.fmin( self.min, np.where( finite, block, np.inf ).min( axis=0, initial=np.inf ) )
+        self.max     = np.fmax( self.max, np.where( finite, block, -np.inf ).max( axis=0, initial=-np.inf ) )
+        self.n_rows += len( block )
+
+        for j in range( len( self.count ) ):
+            column = np.sort( block[ finite[ :, j ], j ] )
+            self._mergeSketch( j, column, np.ones( len( column ) ) )
+
+        return self
+
+    def _mergeSketch( self, j, values, weights ):
+        """ Merge sorted weighted points into column j's sketch """
+
+        old_v, old_w = self.sketch[ j ]
+        merged = np.concatenate( [ old_v, values ] )
+        order  = np.argsort( merged, kind="mergesort" )
+        self.sketch[ j ] = _compress( merged[ order ], np.concatenate( [ old_w, weights ] )[ order ], self.max_points )
+
+    def merge( self, other ):
+        """
+        Fold in statistics from another scaler over different rows (another
+        chunk or pair), as if its blocks had been passed to update
+        """
+
+        self._combine( other.count, other.mean, other.m2 )
+        self.min     = np.fmin( self.min, other.min )
+        self.max     = np.fmax( self.max, other.max )
+        self.n_rows += other.n_rows
+
+        for j, ( values, weights ) in enumerate( other.sketch ):
+            self._mergeSketch( j, values, weights )
+
+        return self
+
+    def variance( self ):
+        """ Sample variance (ddof=1) per column """
+        with np.errstate( divide="ignore", invalid="ignore" ):
+            return np.where( self.count > 1, self.m2 / ( self.count - 1 ), np.nan )
+
+    def std( self ):
+        return np.sqrt( self.variance() )
+
+    def quantile( self, q ):
+        """
+        Approximate q-quantile per column, exact at q=0 and q=1
+        """
+
+        out = np.full( len( self.count ), np.nan )
+        for j, ( values, weights ) in enumerate( self.sketch ):
+            if len( values ) == 0:
+                continue
+            mid    = ( np.cumsum( weights ) - weights / 2 ) / weights.sum()
+            out[ j ] = np.interp( q, np.r_[ 0.0, mid, 1.0 ], np.r_[ self.min[ j ], values, self.max[ j ] ] )
+
+        return out
+
+    def transform( self, block, columns=None, method="standard" ):
+        """
+        Scale a float32 block in place, no temporary copies of the block.
+
+        Args:
+            block:
+                C-contiguous float32 array ( rows, len(columns) )
+            columns:
+                Scaler columns matching the block's columns, default all
+            method:
+                "standard" ( x - mean ) / std, "minmax" to [0, 1] or
+                "robust" ( x - median ) / IQR
+        Returns:
+            block:
+                The same array, scaled
+        """
+
+        if block.dtype != np.float32 or not block.flags.c_contiguous:
+            raise TypeError( "(SCALER) transform: block must be a C-contiguous float32 array, scaling is in place" )
+
+        cols = slice( None ) if columns is None else np.asarray( columns )
+
+        if method == "standard":
+            centre, scale = self.mean[ cols ], self.std()[ cols ]
+        elif method == "minmax":
+            centre, scale = self.min[ cols ], ( self.max - self.min )[ cols ]
+        elif method == "robust":
+            centre = self.quantile( 0.5 )[ cols ]
+            scale  = ( self.quantile( 0.75 ) - self.quantile( 0.25 ) )[ cols ]
+        else:
+            raise ValueError( f"(SCALER) Invalid method {method}, expected standard, minmax or robust" )
+
+        # Constant or empty columns are only centred, as in tuning._objective
+        scale = np.where( np.isfinite( scale ) & ( scale != 0 ), scale, 1.0 )
+
+        np.subtract( block, centre.astype( np.float32 ), out=block )
+        np.multiply( block, ( 1 / scale ).astype( np.float32 ), out=block )
+
+        return block
+
+    def save( self, path ):
+        """
+        Write to .npz, sketches stored flat with offsets
+        """
+
+        sizes = [ len( v ) for v, _ in self.sketch ]
+        np.savez(
+            path,
+            columns        = np.array( self.columns if self.columns is not None else [], dtype=str ),
+            fingerprint    = np.array( self.fingerprint or "" ),
+            max_points     = self.max_points,
+            n_rows         = self.n_rows,
+            count          = self.count,
+            mean           = self.mean,
+            m2             = self.m2,
+            min            = self.min,
+            max            = self.max,
+            sketch_values  = np.concatenate( [ v for v, _ in self.sketch ] ),
+            sketch_weights = np.concatenate( [ w for _, w in self.sketch ] ),
+            sketch_offsets = np.concatenate( [ [ 0 ], np.cumsum( sizes ) ] ),
+            )
+
+    @classmethod
+    def load( cls, path ):
+        """
+        Read a scaler written by save
+        """
+
+        data   = np.load( path )
+        scaler = cls( len( data[ "count" ] ), int( data[ "max_points" ] ) )
+
+        scaler.n_rows = int( data[ "n_rows" ] )
+        if "columns" in data.files:
+            scaler.columns     = data[ "columns" ].tolist() or None
+            scaler.fingerprint = str( data[ "fingerprint" ] ) or None
+        for name in ( "count", "mean", "m2", "min", "max" ):
+            setattr( scaler, name, data[ name ] )
+
+        offsets = data[ "sketch_offsets" ]
+        scaler.sketch = [
+            ( data[ "sketch_values" ][ a:b ], data[ "sketch_weights" ][ a:b ] )
+            for a, b in zip( offsets[ :-1 ], offsets[ 1: ] )
+            ]
+
+        return scaler
+
+
+def mergeScalers(
+        scalers
+        ):
+    """
+    Merge scalers over disjoint rows, e.g. one per pair's feature store
+    """
+
+    merged = StreamingScaler( len( scalers[0].count ), scalers[0].max_points )
+    for scaler in scalers:
+        merged.merge( scaler )
+
+    return merged
+
+
+def _fitRows(
+        args
+        ):
+    """
+    Worker: statistics for rows [ start, stop ) of a feature store,
+    read from the shared memory map in sub-blocks
+    """
+
+    store_dir, start, stop, block_rows, max_points = args
+    matrix, _ = tuning.loadFeatureStore( store_dir )
+
+    scaler = StreamingScaler( matrix.shape[1], max_points )
+    for a in range( start, stop, block_rows ):
+        scaler.update( matrix[ a : min( a + block_rows, stop ) ] )
+
+    return scaler
+
+
+def _storeColumns(
+        index
+        ):
+    """
+    Matrix column names of a feature store, label last
+    """
+
+    return index[ "columns" ] + [ "label" ]
+
+
+def _rowsFingerprint(
+        matrix,
+        index,
+        n_rows
+        ):
+    """
+    Hash of the features in FINGERPRINT_ROWS evenly spaced rows among the
+    first 'n_rows', first and last included, so a store whose history
+    changed (e.g. a rolling lookback moving its start) is told apart from
+    one with only new rows appended. The label is left out as appending
+    fills in the last 'steps' labels.
+    """
+
+    rows   = np.unique( np.linspace( 0, n_rows - 1, FINGERPRINT_ROWS ).astype( np.int64 ) ) if n_rows else []
+    digest = hashlib.sha1( str( n_rows ).encode() )
+    digest.update( np.ascontiguousarray( np.delete( matrix[ rows ], index[ "label" ], axis=1 ) ).tobytes() )
+
+    return digest.hexdigest()
+
+
+def fitStoreScaler(
+        store_dir,
+        rows_per_chunk=1_000_000,
+        block_rows=100_000,
+        max_points=200,
+        n_workers=None,
+        resume=True
+        ):
+    """
+    Compute scaling statistics for a feature store built by
+    tuning.buildFeatureStore, chunks in parallel processes over the
+    memory map, and save them as <store_dir>/scaler.npz.
+
+    With 'resume', an existing scaler is loaded and only rows after
+    those it has seen are added, so a store rebuilt with new candles
+    appended doesn't recompute the history. The scaler is refitted from
+    scratch if the store's columns or the rows it has seen (checked by
+    a fingerprint of sampled rows) no longer match.
+
+    Args:
+        store_dir:
+            Feature store directory
+        rows_per_chunk:
+            Rows per worker task
+        block_rows:
+            Rows read at once inside a task
+        max_points:
+            Quantile sketch size per column
+        n_workers:
+            Number of worker processes, defaults to the CPU count
+        resume:
+            Continue from a saved scaler
+    Returns:
+        scaler:
+            The saved StreamingScaler, label column included
+    """
+
+    path          = os.path.join( store_dir, tuning.SCALER_FILE )
+    matrix, index = tuning.loadFeatureStore( store_dir )
+    columns       = _storeColumns( index )
+    n_rows        = matrix.shape[0]
+
+    scaler = StreamingScaler.load( path ) if resume and os.path.exists( path ) else None
+
+    # Only resume over the same columns and the same leading rows
+    if scaler is not None and (
+            scaler.columns != columns
+            or scaler.n_rows > n_rows
+            or scaler.fingerprint != _rowsFingerprint( matrix, index, scaler.n_rows )
+            ):
+        print( " [SCALER] Saved scaler doesn't match the store, refitting" )
+        scaler = None
+
+    first = scaler.n_rows if scaler is not None else 0
+
+    tasks = [ ( store_dir, a, min( a + rows_per_chunk, n_rows ), block_rows, max_points ) for a in range( first, n_rows, rows_per_chunk ) ]
+
+    print( f" [SCALER] {n_rows - first} new rows of {n_rows} in {len(tasks)} chunks" )
+
+    if tasks:
+        with ProcessPoolExecutor( max_workers=min( n_workers or os.cpu_count(), len( tasks ) ) ) as pool:
+            parts = list( pool.map( _fitRows, tasks ) )
+
+        scaler = mergeScalers( ( [ scaler ] if scaler is not None else [] ) + parts )
+        scaler.columns     = columns
+        scaler.fingerprint = _rowsFingerprint( matrix, index, scaler.n_rows )
+        scaler.save( path )
+
+    del matrix
+
+    return scaler
+
+
+def loadStoreScaler(
+        store_dir
+        ):
+    """
+    Scaler saved by fitStoreScaler
+    """
+
+    return StreamingScaler.load( os.path.join( store_dir, tuning.SCALER_FILE ) )
@@ -0,0 +1,300 @@
+"""
+" Parallel Optuna search over a feature matrix precomputed once for
+" a grid of indicator periods and shared between worker processes
+" through a memory-mapped .npy file
+"
+" @author: Michael Kane
+" @date:   21/10/2025
+"""
+import hashlib, json, os, shutil
+import multiprocessing as mp
+import numpy as np
+import optuna
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+from sagitta.prep import manual_indicators
+from sagitta.utils import io
+
+
+# File names inside a feature store directory
+MATRIX_FILE  = "features.npy"
+INDEX_FILE   = "features_index.json"
+JOURNAL_FILE = "optuna_journal.log"
+CACHE_DIR    = "cv_cache"
+SCALER_FILE  = "scaler.npz"
+
+
+def buildFeatureStore(
+        df,
+        feature_grid,
+        steps,
+        threshold,
+        store_dir
+        ):
+    """
+    Compute every indicator for every option in 'feature_grid' once and
+    write the result, plus the binary label, as a float32 memory-mappable
+    matrix. Each option is computed on its own copy of the raw columns so
+    indicators with fixed column names (rsi, atr, ...) don't overwrite
+    each other.
+
+    Args:
+        df:
+            Cleaned kline dataframe
+        feature_grid:
+            Dict of manual_indicators function name -> list of kwargs, e.g.
+            { "addRSI": [ { "RSI_period": 7 }, { "RSI_period": 14 } ] }
+        steps:
+            Label horizon passed to addFuturePriceColumn
+        threshold:
+            Label threshold passed to addBinaryLabel
+        store_dir:
+            Directory to write the matrix and its index to
+    Returns:
+        index:
+            Dict describing which matrix columns belong to each option
+    """
+
+    print( f" [TRAIN] Building feature store in {store_dir}... " )
+
+    os.makedirs( store_dir, exist_ok=True )
+
+    index_path = os.path.join( store_dir, INDEX_FILE )
+    previous   = io.load_JSON( index_path ) if os.path.exists( index_path ) else None
+
+    base    = df[ [ "open", "high", "low", "close", "volume" ] ]
+    columns = []
+    blocks  = []
+    options = {}
+
+    for name, kwargs_list in feature_grid.items():
+        options[ name ] = []
+
+        for kwargs in kwargs_list:
+            # Fresh copy per option, keep only the columns it added
+            out     = getattr( manual_indicators, name )( base.copy(), **kwargs )
+            added   = [ c for c in out.columns if c not in base.columns ]
+            start   = len( columns )
+
+            columns.extend( [ f"{name}|{json.dumps(kwargs, sort_keys=True)}|{c}" for c in added ] )
+            blocks.extend( [ out[ c ].to_numpy( dtype=np.float32 ) for c in added ] )
+            options[ name ].append( { "kwargs": kwargs, "columns": list( range( start, len(columns) ) ) } )
+
+    # Label, rows without a future price are NaN so they are never used
+    labelled = manual_indicators.addBinaryLabel( manual_indicators.addFuturePriceColumn( base.copy(), steps ), threshold )
+    label    = labelled[ "binary_label" ].to_numpy( dtype=np.float32 )
+    label[ labelled[ "future_price" ].isna().to_numpy() ] = np.nan
+    blocks.append( label )
+
+    # Write straight into the memory map, column by column, hashing the
+    # contents so caches built on the store can tell when it changed
+    shape  = ( len(base), len(blocks) )
+    digest = hashlib.sha1( str( shape ).encode() )
+    matrix = np.lib.format.open_memmap( os.path.join( store_dir, MATRIX_FILE ), mode="w+", dtype=np.float32, shape=shape )
+    for i, block in enumerate( blocks ):
+        matrix[ :, i ] = block
+        digest.update( block.tobytes() )
+    matrix.flush()
+    del matrix
+
+    index = { "columns": columns, "options": options, "label": len( blocks ) - 1, "steps": steps, "threshold": threshold, "fingerprint": digest.hexdigest() }
+    with open( index_path, "w" ) as f:
+        json.dump( index, f, indent=2 )
+
+    # Results cached for other contents are stale. The scaler is only
+    # removed when the columns change, fitStoreScaler checks the rows
+    # itself so a store with candles appended still resumes
+    if previous is not None and previous.get( "fingerprint" ) != index[ "fingerprint" ]:
+        shutil.rmtree( os.path.join( store_dir, CACHE_DIR ), ignore_errors=True )
+    scaler_path = os.path.join( store_dir, SCALER_FILE )
+    if os.path.exists( scaler_path ) and ( previous is None or previous[ "columns" ] != columns ):
+        os.remove( scaler_path )
+
+    print( f" [TRAIN] Stored {len(base)} rows x {len(blocks)} columns" )
+
+    return index
+
+
+def loadFeatureStore(
+        store_dir
+        ):
+    """
+    Open a feature store read-only. The matrix is memory mapped so every
+    process shares the same pages.
+
+    Returns:
+        matrix:
+            Read-only float32 memmap, label in column index["label"]
+        index:
+            Dict describing the matrix columns
+    """
+
+    index  = io.load_JSON( os.path.join( store_dir, INDEX_FILE ) )
+    matrix = np.load( os.path.join( store_dir, MATRIX_FILE ), mmap_mode="r" )
+
+    return matrix, index
+
+
+def _objective(
+        trial,
+        matrix,
+        index,
+        valid_fraction,
+        n_epochs
+        ):
+    """
+    Sample one option (or none) per indicator, fit an SGD logistic model
+    on the earlier rows and score ROC AUC on the later rows. Intermediate
+    scores are reported every epoch for pruning.
+    """
+
+    # Pick columns from the precomputed grid, -1 leaves the indicator out
+    cols = []
+    for name, opts in index[ "options" ].items():
+        choice = trial.suggest_categorical( name, list( range( -1, len(opts) ) ) )
+        if choice >= 0:
+            cols.extend( opts[ choice ][ "columns" ] )
+
+    if not cols:
+        raise optuna.TrialPruned( "No features selected" )
+
+    alpha = trial.suggest_float( "alpha", 1e-6, 1e-1, log=True )
+
+    # Rows where every selected feature and the label are finite
+    X = matrix[ :, cols ]
+    y = matrix[ :, index[ "label" ] ]
+    valid = np.isfinite( X ).all( axis=1 ) & np.isfinite( y )
+    X, y  = X[ valid ], y[ valid ].astype( np.int64 )
+
+    # Time ordered split, no shuffling
+    split = int( len( X ) * ( 1 - valid_fraction ) )
+    X_train, X_valid = X[ :split ], X[ split: ]
+    y_train, y_valid = y[ :split ], y[ split: ]
+
+    if split == 0 or len( np.unique( y_train ) ) < 2 or len( np.unique( y_valid ) ) < 2:
+        raise optuna.TrialPruned( "Not enough labelled rows for both classes" )
+
+    # Standardise with training statistics only, in place on the copies
+    mean = X_train.mean( axis=0 )
+    std  = X_train.std( axis=0 )
+    std[ std == 0 ] = 1
+    X_train -= mean; X_train /= std
+    X_valid -= mean; X_valid /= std
+
+    model = SGDClassifier( loss="log_loss", alpha=alpha, random_state=trial.number )
+    score = np.nan
+
+    for epoch in range( n_epochs ):
+        model.partial_fit( X_train, y_train, classes=[ 0, 1 ] )
+        score = roc_auc_score( y_valid, model.decision_function( X_valid ) )
+
+        # Stop unpromising trials early
+        trial.report( score, epoch )
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    return score
+
+
+def _worker(
+        store_dir,
+        study_name,
+        n_trials,
+        valid_fraction,
+        n_epochs
+        ):
+    """
+    Process entry point: attach to the shared study and run trials
+    """
+
+    matrix, index = loadFeatureStore( store_dir )
+    study = optuna.load_study( study_name=study_name, storage=_storage( store_dir ), pruner=_pruner() )
+
+    study.optimize(
+        lambda trial: _objective( trial, matrix, index, valid_fraction, n_epochs ),
+        n_trials=n_trials
+        )
+
+
+def _storage(
+        store_dir
+        ):
+    """
+    Journal file storage, safe for several processes on one node
+    """
+
+    return JournalStorage( JournalFileBackend( os.path.join( store_dir, JOURNAL_FILE ) ) )
+
+
+def _pruner():
+    """
+    Median pruner, pruner settings are not stored with the study so every
+    worker builds its own
+    """
+
+    return optuna.pruners.MedianPruner( n_startup_trials=5, n_warmup_steps=2 )
+
+
+def runTuning(
+        store_dir,
+        study_name,
+        n_trials,
+        n_workers=None,
+        valid_fraction=0.2,
+        n_epochs=10
+        ):
+    """
+    Run an Optuna study over a feature store built by buildFeatureStore,
+    spread across worker processes which share the memory-mapped matrix.
+
+    Args:
+        store_dir:
+            Feature store directory
+        study_name:
+            Study name, an existing study of the same name is resumed
+        n_trials:
+            Total number of trials over all workers
+        n_workers:
+            Number of worker processes, defaults to the CPU count
+        valid_fraction:
+            Fraction of the latest rows used for validation
+        n_epochs:
+            SGD epochs per trial, also the number of pruning checkpoints
+    Returns:
+        study:
+            The finished Optuna study
+    """
+
+    n_workers = n_workers or os.cpu_count()
+
+    print( f" [TRAIN] Running {n_trials} trials of {study_name} on {n_workers} workers" )
+
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=_storage( store_dir ),
+        direction="maximize",
+        pruner=_pruner(),
+        load_if_exists=True
+        )
+
+    # Share trials out, first workers take the remainder
+    per_worker = [ n_trials // n_workers + ( 1 if i < n_trials % n_workers else 0 ) for i in range( n_workers ) ]
+    processes  = [
+        mp.Process( target=_worker, args=( store_dir, study_name, n, valid_fraction, n_epochs ) )
+        for n in per_worker if n > 0
+        ]
+
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    failed = [ p.exitcode for p in processes if p.exitcode != 0 ]
+    if failed:
+        raise RuntimeError( f"(TRAIN) runTuning: {len(failed)} worker(s) failed with exit codes {failed}" )
+
+    print( f" [TRAIN] Best value {study.best_value:.4f} with {study.best_params}" )
+
+    return study
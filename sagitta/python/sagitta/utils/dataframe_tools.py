@@ -4,6 +4,7 @@
 " @author: Michael Kane
 " @date:   08/09/2025
 """
+import pandas as pd
 
 
 def subDataframe(
@@ -11,8 +12,9 @@ def subDataframe(
         features
         ):
     """
-    Takes a larger dataframe, iterates through it and creates
-    a new dataframe with the columns from the list
+    Takes a larger dataframe and creates a new dataframe with the
+    columns from the list. Columns are views on the parent's data
+    rather than copies.
 
     Args:
         dataframe:
@@ -25,5 +27,5 @@ def subDataframe(
             defined within 'features'
     """
 
-    # Loop through parent dataframe and extract all columns in 'features'
-    return dataframe[ [ feature for feature in features ] ]
\ No newline at end of file
+    # Build from the parent's columns without copying or consolidating them
+    return pd.DataFrame( { feature: dataframe[ feature ] for feature in features }, copy=False )
\ No newline at end of file
@@ -4,10 +4,11 @@
 " @author: Michael Kane
 " @date:   07/09/2025
 """
+from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
 from pandas.errors import EmptyDataError
 import pandas as pd
-import json, os, pyarrow
+import json, os, pyarrow, threading, yaml
 
 
 def load_JSON(
@@ -40,6 +41,35 @@ def load_JSON(
     
 
 
+def load_YAML(
+        path
+        ):
+    """
+    Helper to load YAML file
+    """
+
+    # Check path exists
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+
+    print(f" [IO] Loading {path}... ", end="")
+
+    # Try to open...
+    try:
+        with open(path, "r") as f:
+            data = yaml.safe_load(f)
+    # Check YAML parses...
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML in {path}: {e}") from e
+    # Check readable...
+    except OSError as e:
+        raise RuntimeError(f"Could not read {path}: {e}") from e
+    # File returned!
+    else:
+        print("success!")
+        return data or {}
+
+
 def load_ParquetToDf(
         path,
         columns=None
@@ -66,60 +96,210 @@ def load_ParquetToDf(
         return df
 
 
+def scan_ParquetToLazy(
+        path,
+        columns=None
+        ):
+    """
+    Helper to lazily scan a Parquet file into a polars LazyFrame.
+    Nothing is read until the query is collected.
+    """
+
+    # polars is optional, only needed for the polars backend
+    import polars as pl
+
+    # Check path exists
+    if not os.path.exists( path ):
+        raise FileNotFoundError( f"File not found: {path}" )
+
+    print( f" [IO] Scanning {path}... ", end="" )
+
+    # Try scan parquet, schema is read so bad files fail here
+    try:
+        lf = pl.scan_parquet( path )
+        lf.collect_schema()
+    except (OSError, pl.exceptions.ComputeError) as e:
+        raise ValueError( f"Invalid or unreadable Parquet in {path}: {e}" ) from e
+    else:
+        print( "success!" )
+        return lf if columns is None else lf.select( columns )
+
+
+def _tempName(
+        name,
+        atomic
+        ):
+    """
+    Path to write to: the final name, or a hidden temp file next to it
+    which _finalise renames over the final name
+    """
+
+    if not atomic:
+        return name
+
+    head, tail = os.path.split( name )
+
+    return os.path.join( head, f".{tail}.{os.getpid()}.{threading.get_ident()}.tmp" )
+
+
+def _finalise(
+        tmp_name,
+        name
+        ):
+    """
+    Atomically move a completed temp file into place
+    """
+
+    if tmp_name != name:
+        os.replace( tmp_name, name )
+
+
 def save_DfToCsv(
         df,
         name,
-        index=False
+        index=False,
+        atomic=False
         ):
     """
-    Function to save a pandas data frame to .CSV
+    Function to save a pandas data frame to .CSV. With atomic=True the
+    file is written to a temp file and renamed, so readers never see a
+    partial file.
     """
 
     # Cautionary check of file name
     if name.endswith(".csv"):
-        name = name[:4]
+        name = name[:-4]
 
     # Add suffix
     name = name + '.csv'
-
-    print(f" [IO] Saving {name}... ", end="")
+    tmp_name = _tempName( name, atomic )
 
     # Try to save .csv
     try:
-        df.to_csv(name, index=index)
+        df.to_csv(tmp_name, index=index)
+        _finalise(tmp_name, name)
     # If fails...
     except Exception as e:
+        if tmp_name != name and os.path.exists(tmp_name):
+            os.remove(tmp_name)
         raise RuntimeError(f"Failed to save DataFrame to {name}") from e
-    # Else success...
+    # Else success, printed in one go so concurrent writers don't interleave
     else:
-        print("success!")
+        print(f" [IO] Saving {name}... success!")
+
+    return name
 
 
 def save_DfToParquet(
         df,
         name,
         engine="pyarrow",
-        index=False
+        index=False,
+        compression="snappy",
+        row_group_size=None,
+        use_dictionary=True,
+        write_statistics=True,
+        atomic=False
         ):
     """
     Function to save a pandas data frame to .parquet
+
+    Args:
+        compression:
+            Codec, e.g. "snappy", "zstd", "lz4", "gzip" or None
+        row_group_size:
+            Maximum rows per row group, None for the pyarrow default
+        use_dictionary:
+            Dictionary encode all columns (bool) or only the listed ones
+        write_statistics:
+            Write min/max statistics for all columns (bool) or only the
+            listed ones, used by readers to skip row groups
+        atomic:
+            Write to a temp file and rename into place
     """
 
     # Cautionary check of file name
     if name.endswith(".parquet"):
-        name = name[:8]
+        name = name[:-8]
 
     # Add suffix
     name = name + '.parquet'
+    tmp_name = _tempName( name, atomic )
 
-    print(f" [IO] Saving {name} using {engine}... ", end="")
-
-    # Try to save .csv
+    # Try to save .parquet
     try:
-        df.to_parquet( name, engine=engine, index=index )
+        df.to_parquet(
+            tmp_name,
+            engine=engine,
+            index=index,
+            compression=compression,
+            row_group_size=row_group_size,
+            use_dictionary=use_dictionary,
+            write_statistics=write_statistics
+            )
+        _finalise( tmp_name, name )
     # If fails...
     except Exception as e:
+        if tmp_name != name and os.path.exists( tmp_name ):
+            os.remove( tmp_name )
         raise RuntimeError(f"Failed to save DataFrame to {name}") from e
-    # Else success...
+    # Else success, printed in one go so concurrent writers don't interleave
     else:
-        print("success!")
\ No newline at end of file
+        print(f" [IO] Saving {name} using {engine} ({compression})... success!")
+
+    return name
+
+
+# Format name -> writer
+WRITERS = {
+    "csv":     save_DfToCsv,
+    "parquet": save_DfToParquet,
+}
+
+
+def save_DfToFormats(
+        df,
+        name,
+        formats=( "parquet", ),
+        atomic=False,
+        parquet_options=None,
+        max_workers=None
+        ):
+    """
+    Save a pandas data frame to several formats concurrently, one thread
+    per format (the writers release the GIL for most of their work).
+
+    Args:
+        df:
+            Dataframe to save
+        name:
+            Save name without suffix
+        formats:
+            Iterable of formats from WRITERS, e.g. [ "csv", "parquet" ]
+        atomic:
+            Write each file to a temp file and rename into place
+        parquet_options:
+            Dict of extra save_DfToParquet options (compression,
+            row_group_size, use_dictionary, write_statistics)
+        max_workers:
+            Thread count, defaults to one per format
+    Returns:
+        paths:
+            Dict of format -> saved path
+    """
+
+    formats = list( dict.fromkeys( formats ) )
+    unknown = [ f for f in formats if f not in WRITERS ]
+    if unknown:
+        raise ValueError( f"Unknown output format(s) {unknown}, expected any of {list(WRITERS)}" )
+
+    options = { "parquet": parquet_options or {} }
+
+    with ThreadPoolExecutor( max_workers=max_workers or len( formats ) or 1 ) as pool:
+        futures = {
+            fmt: pool.submit( WRITERS[ fmt ], df, name, atomic=atomic, **options.get( fmt, {} ) )
+            for fmt in formats
+            }
+
+    # Re-raise the first failure, every writer has finished by now
+    return { fmt: future.result() for fmt, future in futures.items() }
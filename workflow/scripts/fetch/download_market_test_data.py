@@ -29,6 +29,8 @@ def main():
     parser.add_argument( "--pair",      required=True, help="Trading pair, e.g. ETHUSDT" )
     parser.add_argument( "--period",    required=True, help="Candle period, e.g. 1h"     )
     parser.add_argument( "--start",     required=True, help="Lookback, e.g. 720d"        )
+    parser.add_argument( "--formats",   default="csv,parquet", help="Comma separated output formats" )
+    parser.add_argument( "--attempts",  default=3, type=int, help="Resumed fetch attempts after a failure" )
 
     # Get argument reference
     args   = parser.parse_args()
@@ -36,25 +38,35 @@ def main():
     # Load json holding them
     keys   = io.load_JSON( args.keys_path )[ 'test_keys' ]
 
-    # Get public and secret keys for Testnet
+    # Get public key for Testnet, klines are public so the secret isn't needed
     public = keys['public']
-    secret = keys['secret']
 
-    # Retrieve clients from binance
+    # Shared pooled session with retries
     # NOTE: These are hard configured for test account only at the moment
-    main_client = fetch_client.fetchClient( clientType='main', public=public, secret=secret )
+    main_session = fetch_client.fetchSession( clientType='main', public=public )
 
-    # With client, get market information for defined pair (list output)
-    klines      = fetch_market.fetchKlineData( client=main_client, pair=args.pair, period=args.period, start=args.start )
+    # With session, page market information for defined pair (list output),
+    # resuming from the klines already received if paging fails part way
+    klines = []
+    for attempt in range( args.attempts + 1 ):
+        try:
+            klines = fetch_market.fetchKlineDataResumable( session=main_session, pair=args.pair, period=args.period, start=args.start, klines=klines )
+            break
+        except fetch_market.KlineFetchError as e:
+            klines = e.klines
+            print( f" [FETCH] Attempt {attempt+1} failed with {len(klines)} klines held, resume from {e.resume_from}: {e}" )
+    else:
+        # Keep what was fetched rather than losing the backfill
+        if klines:
+            io.save_DfToFormats( klines_to_dataframe.convertKlinesToDataframe( klines ), f"{args.save_name}_partial", formats=args.formats.split( "," ), atomic=True )
+            print( f" [FETCH] Saved {len(klines)} partial klines to {args.save_name}_partial" )
+        return 1
 
     # Convery raw klines list to a pandas dataframe
     klines_df   = klines_to_dataframe.convertKlinesToDataframe( klines )
 
-    # As CSV
-    io.save_DfToCsv( klines_df, args.save_name )
-
-    # As parquet
-    io.save_DfToParquet( klines_df, args.save_name )
+    # Save every requested format concurrently, renamed into place once complete
+    io.save_DfToFormats( klines_df, args.save_name, formats=args.formats.split( "," ), atomic=True )
 
 
 # Return exit code posrt execute it